@@ -0,0 +1,214 @@
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.blob.derivatives import derivative_builder, remove_derivatives
+from src.blob.media import load_image_media
+from src.blob.models import Blob, Upload
+from src.blob.resumable import create_upload_file, remove_upload_files
+from src.config import settings
+from src.blob.store import blob_entry, blob_path, entry_sha256, place_blob
+from src.dao.base import BaseDAO
+from src.database import with_session
+from src.page.models import Page, PageFile
+from src.page.upload import StoredUpload
+
+
+def _place_all(uploads: list[StoredUpload]) -> int:
+    return sum(place_blob(upload.path, upload.sha256) for upload in uploads)
+
+
+def _discard_all(uploads: list[StoredUpload]) -> None:
+    for upload in uploads:
+        upload.path.unlink(missing_ok=True)
+
+
+def _unlink_blobs(hashes: list[str]) -> None:
+    for sha256 in hashes:
+        blob_path(sha256).unlink(missing_ok=True)
+    remove_derivatives(hashes)
+
+
+class BlobDAO(BaseDAO):
+    model = Blob
+
+    @classmethod
+    @with_session
+    async def acquire(cls, session, uploads: list[StoredUpload]) -> list[dict]:
+        """
+        Регистрирует загрузки как блобы (refcount + 1 на каждую) и
+        переносит файлы на место. Строки для page_files — в порядке uploads.
+        Блокировка строки блоба держится до коммита, поэтому параллельный
+        release не удалит файл между upsert и переносом.
+        """
+        counts = Counter(upload.sha256 for upload in uploads)
+        first = {upload.sha256: upload for upload in reversed(uploads)}
+        rows = [
+            {
+                "sha256": sha256,
+                "size": first[sha256].size,
+                "content_type": first[sha256].content_type,
+                "refcount": count,
+            }
+            # одинаковый порядок блокировок во всех транзакциях — без взаимоблокировок
+            for sha256, count in sorted(counts.items())
+        ]
+        statement = insert(Blob).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"refcount": Blob.refcount + statement.excluded.refcount},
+        )
+        try:
+            await session.execute(statement)
+            await run_in_threadpool(_place_all, uploads)
+            await session.commit()
+        except BaseException as e:
+            await session.rollback()
+            await run_in_threadpool(_discard_all, uploads)
+            if isinstance(e, SQLAlchemyError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            raise
+        for row in rows:
+            derivative_builder.schedule(row["sha256"], row["content_type"])
+        return [
+            {
+                "name": blob_entry(upload.sha256, upload.filename),
+                "sha256": upload.sha256,
+                "size": upload.size,
+                "content_type": upload.content_type,
+            }
+            for upload in uploads
+        ]
+
+    @classmethod
+    @with_session
+    async def acquire_existing(cls, session, sha256: str, filename: str, user_id: int) -> dict | None:
+        """
+        Ещё одна ссылка на уже хранимый блоб, без загрузки. Хеш сам по себе
+        не доказывает владения байтами, поэтому блоб должен уже быть в файлах
+        одной из страниц пользователя. None — иначе (ответ одинаков, есть ли
+        блоб у других: наличие чужих файлов не раскрывается).
+        """
+        owned = exists().where(PageFile.sha256 == sha256, PageFile.page_id == Page.id, Page.user_id == user_id)
+        try:
+            row = (await session.execute(
+                update(Blob)
+                .where(Blob.sha256 == sha256, Blob.refcount > 0, owned)
+                .values(refcount=Blob.refcount + 1)
+                .returning(Blob.size, Blob.content_type)
+            )).first()
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if row is None:
+            return None
+        return {
+            "name": blob_entry(sha256, filename),
+            "sha256": sha256,
+            "size": row.size,
+            "content_type": row.content_type,
+        }
+
+    @classmethod
+    @with_session
+    async def release(cls, session, entries: list[str]) -> int:
+        """
+        Снимает ссылки файлов страниц (имена из page_files); блобы без ссылок удаляются вместе
+        с файлом. Старые пути pages/{id}/... пропускаются. Число удалённых блобов.
+        """
+        counts = Counter(sha256 for entry in entries if (sha256 := entry_sha256(entry)))
+        if not counts:
+            return 0
+        for sha256, count in sorted(counts.items()):
+            await session.execute(
+                update(Blob).where(Blob.sha256 == sha256).values(refcount=Blob.refcount - count)
+            )
+        dead = list(await session.scalars(
+            delete(Blob).where(Blob.sha256.in_(counts), Blob.refcount <= 0).returning(Blob.sha256)
+        ))
+        try:
+            # файл удаляется под блокировкой строки: acquire того же хеша ждёт коммита
+            await run_in_threadpool(_unlink_blobs, dead)
+            await session.commit()
+        except SQLAlchemyError:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+        return len(dead)
+
+    @classmethod
+    @with_session
+    async def get_content_type(cls, session, sha256: str) -> str | None:
+        return await session.scalar(select(Blob.content_type).where(Blob.sha256 == sha256))
+
+    @classmethod
+    @with_session
+    async def get_readable(cls, session, sha256: str, user_id: int | None) -> tuple[str, bool] | None:
+        """
+        (content_type, public) блоба, если его можно отдать: он в файлах
+        опубликованной страницы или страницы самого пользователя. None — нельзя.
+        """
+        visible = Page.published if user_id is None else or_(Page.published, Page.user_id == user_id)
+        row = (await session.execute(
+            select(Blob.content_type, func.bool_or(Page.published).label("public"))
+            .join(PageFile, PageFile.sha256 == Blob.sha256)
+            .join(Page, Page.id == PageFile.page_id)
+            .where(Blob.sha256 == sha256, visible)
+            .group_by(Blob.content_type)
+        )).first()
+        return (row.content_type, row.public) if row else None
+
+    @classmethod
+    @with_session
+    async def image_media(cls, session, page_id: int, elements: list | None) -> dict[str, dict]:
+        return await load_image_media(session, page_id, elements)
+
+
+class UploadDAO(BaseDAO):
+    model = Upload
+
+    @classmethod
+    @with_session
+    async def add(cls, session, user_id: int, page_id: int, filename: str, size: int, sha256: str | None) -> Upload:
+        upload = Upload(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            page_id=page_id,
+            filename=filename,
+            size=size,
+            sha256=sha256,
+            expires_at=func.now() + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS),
+        )
+        await run_in_threadpool(create_upload_file, upload.id)
+        session.add(upload)
+        try:
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            await run_in_threadpool(remove_upload_files, [upload.id])
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return upload
+
+    @classmethod
+    @with_session
+    async def remove(cls, session, upload_id: str) -> None:
+        await session.execute(delete(Upload).where(Upload.id == upload_id))
+        await session.commit()
+        await run_in_threadpool(remove_upload_files, [upload_id])
+
+    @classmethod
+    @with_session
+    async def purge_expired(cls, session) -> int:
+        """Брошенные сессии: строки и недокачанные файлы."""
+        expired = list(await session.scalars(
+            delete(Upload).where(Upload.expires_at < func.now()).returning(Upload.id)
+        ))
+        await session.commit()
+        await run_in_threadpool(remove_upload_files, expired)
+        return len(expired)
@@ -0,0 +1,139 @@
+"""
+Уменьшенные копии загруженных картинок: несколько ширин в WebP (и AVIF,
+если Pillow собран с ним).
+
+Копии строятся для блоба, а не для страницы: одинаковая картинка на
+разных страницах обрабатывается один раз. Декодирование и ресайз идут в
+пуле процессов рендера, запрос загрузки их не ждёт. Готовый список копий
+пишется в Blob.variants; страницы с этим файлом сбрасывают кеш и
+пересобирают снимок, чтобы начать ссылаться на копии.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from PIL import Image, ImageOps, features
+from sqlalchemy import select, update
+
+from src.blob.models import Blob
+from src.blob.store import BLOB_DIR, blob_path
+from src.database import async_session_maker
+from src.page.cache import public_page_cache
+from src.page.models import PageFile
+from src.page.snapshot import snapshot_builder
+from src.qr.pool import get_render_pool, pool_size
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = BLOB_DIR / "derived"
+VARIANT_WIDTHS = (320, 640, 1280)
+# формат -> (расширение, media type, параметры save)
+VARIANT_FORMATS = {"webp": (".webp", "image/webp", {"quality": 80, "method": 4})}
+if features.check("avif"):
+    VARIANT_FORMATS["avif"] = (".avif", "image/avif", {"quality": 60, "speed": 8})
+# что умеем декодировать; анимации и векторы не трогаем
+SOURCE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp", "image/avif"}
+MAX_SOURCE_PIXELS = 60_000_000
+
+
+def derived_dir(sha256: str) -> Path:
+    return DERIVED_DIR / sha256[:2] / sha256
+
+
+def variant_name(width: int, fmt: str) -> str:
+    return f"{width}{VARIANT_FORMATS[fmt][0]}"
+
+
+def variant_path(sha256: str, name: str) -> Path:
+    return derived_dir(sha256) / name
+
+
+def remove_derivatives(hashes: list[str]) -> None:
+    for sha256 in hashes:
+        shutil.rmtree(derived_dir(sha256), ignore_errors=True)
+
+
+def render_variants(sha256: str) -> list[dict]:
+    """
+    В процессе пула: все копии одного блоба. Ширины не больше исходной;
+    если исходник уже узкий — только перекодирование в его ширине.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    try:
+        with Image.open(blob_path(sha256)) as source:
+            if getattr(source, "n_frames", 1) > 1:
+                return []
+            widths = sorted({min(width, source.width) for width in VARIANT_WIDTHS})
+            # JPEG декодируется сразу в уменьшенном масштабе (DCT), если можно
+            source.draft("RGB", (widths[-1], source.height * widths[-1] // source.width))
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (OSError, Image.DecompressionBombError):
+        # битый или слишком большой файл: копий не будет, повторять незачем
+        return []
+    out_dir = derived_dir(sha256)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    variants = []
+    # от большей к меньшей: каждая следующая уменьшается из предыдущей
+    for width in reversed(widths):
+        height = max(round(image.height * width / image.width), 1)
+        if image.width != width:
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt, (suffix, media_type, options) in VARIANT_FORMATS.items():
+            name = variant_name(width, fmt)
+            tmp = out_dir / f"{name}.{os.getpid()}.tmp"
+            image.save(tmp, format=fmt.upper(), **options)
+            size = tmp.stat().st_size
+            os.replace(tmp, out_dir / name)
+            variants.append({"name": name, "width": width, "height": height, "type": media_type, "size": size})
+    return sorted(variants, key=lambda variant: (variant["width"], variant["type"]))
+
+
+class DerivativeBuilder:
+    def __init__(self, concurrency: int):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: dict[str, asyncio.Task] = {}
+        self.built = 0
+        self.failures = 0
+
+    def schedule(self, sha256: str, content_type: str) -> None:
+        """Вызывается после коммита загрузки; повторный вызов для того же блоба ничего не делает."""
+        if content_type not in SOURCE_TYPES or sha256 in self._running:
+            return
+        task = asyncio.create_task(self._build(sha256))
+        self._running[sha256] = task
+        task.add_done_callback(lambda _: self._running.pop(sha256, None))
+
+    async def _build(self, sha256: str) -> None:
+        try:
+            async with async_session_maker() as session:
+                if await session.scalar(select(Blob.variants).where(Blob.sha256 == sha256)) is not None:
+                    return
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                variants = await loop.run_in_executor(get_render_pool(), render_variants, sha256)
+            async with async_session_maker() as session:
+                await session.execute(update(Blob).where(Blob.sha256 == sha256).values(variants=variants))
+                pages = list(await session.scalars(
+                    select(PageFile.page_id).where(PageFile.sha256 == sha256).distinct()
+                ))
+                await session.commit()
+            for page_id in pages:
+                public_page_cache.invalidate_page(page_id)
+                snapshot_builder.schedule(page_id)
+            self.built += 1
+        except Exception:
+            self.failures += 1
+            logger.exception("Image derivatives failed for blob %s", sha256)
+
+    async def close(self) -> None:
+        while self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {"running": len(self._running), "built": self.built, "failures": self.failures}
+
+
+derivative_builder = DerivativeBuilder(concurrency=pool_size())
@@ -0,0 +1,191 @@
+"""
+Отдача файлов блобов: тип содержимого и способ доставки байтов.
+
+Тип определяется один раз при загрузке по сигнатуре в начале файла, а не
+по имени или заголовку клиента, и хранится в Blob.content_type.
+
+Range/If-Range (RFC 7233) обрабатывает FileResponse Starlette; If-Range
+сверяется с нашим ETag (хешем). Сами байты по возможности отдаёт не
+Python: при FILE_ACCEL_REDIRECT приложение только проверяет доступ и
+отвечает X-Accel-Redirect, файл (и диапазоны) отдаёт nginx:
+
+    location /_files/ { internal; alias /app/backend/uploads/; }
+
+Без nginx, если сервер поддерживает ASGI-расширение http.response.pathsend,
+полный ответ уходит через sendfile; иначе — чтение кусками в потоке.
+"""
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from sqlalchemy import exists, select
+
+from src.blob.models import Blob
+from src.config import settings
+from src.page.models import PageFile
+
+# ссылка на блоб в content элемента-картинки
+BLOB_URL = re.compile(r"/blob/([0-9a-f]{64})(?:$|[?#])")
+SNIFF_BYTES = 512
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+UPLOADS_ROOT = Path("uploads")
+# браузер показывает эти типы сам (плеер, просмотрщик), остальное — скачивание
+INLINE_PREFIXES = ("image/", "video/", "audio/", "application/pdf")
+# загруженный файл не должен исполнять скрипты в нашем origin (SVG, HTML)
+BLOB_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; img-src 'self' data:; style-src 'unsafe-inline'; sandbox",
+}
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"\x1a\x45\xdf\xa3", "video/webm"),
+    (b"OggS", "audio/ogg"),
+    (b"ID3", "audio/mpeg"),
+    (b"fLaC", "audio/flac"),
+    (b"BM", "image/bmp"),
+)
+_FTYP_BRANDS = {
+    b"qt  ": "video/quicktime",
+    b"avif": "image/avif",
+    b"avis": "image/avif",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+    b"M4A ": "audio/mp4",
+}
+# по имени — только пассивные форматы, без HTML/JS/SVG
+_SAFE_GUESSES = {
+    "text/plain",
+    "text/csv",
+    "application/json",
+    "application/zip",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+
+def sniff_content_type(head: bytes, filename: str = "") -> str:
+    """Тип по первым байтам файла; имя помогает только для пассивных форматов."""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"WAVE", b"AVI "):
+        return {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}[head[8:12]]
+    if head[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(head[8:12], "video/mp4")
+    if head[:2] == b"\xff\xfb" or head[:2] == b"\xff\xf3":
+        return "audio/mpeg"
+    stripped = head.lstrip()
+    if stripped.startswith((b"<svg", b"<?xml")) and b"<svg" in head:
+        return "image/svg+xml"
+    guessed = mimetypes.guess_type(filename)[0]
+    if guessed in _SAFE_GUESSES:
+        return guessed
+    return DEFAULT_CONTENT_TYPE
+
+
+class SendfileResponse(FileResponse):
+    """FileResponse, который отдаёт файл целиком через сервер (pathsend), если тот умеет."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions") or {}
+        if (
+            "http.response.pathsend" not in extensions
+            or scope["method"].upper() == "HEAD"
+            or "range" in Headers(scope=scope)
+            or self.background is not None
+        ):
+            return await super().__call__(scope, receive, send)
+        if self.stat_result is None:
+            self.set_stat_headers(Path(self.path).stat())
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": str(Path(self.path).resolve())})
+
+
+def _content_disposition(inline: bool, filename: str | None) -> str:
+    kind = "inline" if inline else "attachment"
+    if not filename:
+        return kind
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{kind}; filename*=utf-8''{quoted}"
+    return f'{kind}; filename="{filename}"'
+
+
+def file_response(
+    path: Path,
+    media_type: str,
+    headers: dict | None = None,
+    filename: str | None = None,
+) -> Response:
+    """
+    Ответ с файлом из uploads/: X-Accel-Redirect, если настроен, иначе
+    SendfileResponse с поддержкой Range. Медиа отдаются inline.
+    """
+    headers = {
+        **BLOB_SECURITY_HEADERS,
+        **(headers or {}),
+        "Content-Disposition": _content_disposition(media_type.startswith(INLINE_PREFIXES), filename),
+    }
+    if settings.FILE_ACCEL_REDIRECT:
+        location = settings.FILE_ACCEL_REDIRECT.rstrip("/") + "/" + path.relative_to(UPLOADS_ROOT).as_posix()
+        return Response(media_type=media_type, headers={**headers, "X-Accel-Redirect": location})
+    return SendfileResponse(path, media_type=media_type, headers=headers)
+
+
+def media_info(sha256: str, content_type: str, variants: list[dict] | None) -> dict:
+    """Файл страницы для фронтенда и снимка: оригинал и копии по ширине."""
+    return {
+        "src": f"/blob/{sha256}",
+        "type": content_type,
+        "variants": [
+            {
+                "src": f"/blob/{sha256}/{variant['name']}",
+                "width": variant["width"],
+                "height": variant["height"],
+                "type": variant["type"],
+            }
+            for variant in variants or []
+        ],
+    }
+
+
+def image_hashes(elements: list | None) -> set[str]:
+    """Хеши блобов, на которые ссылаются элементы типа image."""
+    hashes = set()
+    for element in elements or []:
+        if isinstance(element, dict) and element.get("type") == "image" and isinstance(element.get("content"), str):
+            if match := BLOB_URL.search(element["content"]):
+                hashes.add(match.group(1))
+    return hashes
+
+
+async def load_image_media(session, page_id: int, elements: list | None) -> dict[str, dict]:
+    """
+    Хеш -> media_info для картинок страницы: только блобы, которые и
+    вложены в эту страницу, и показаны элементом image. Остальные
+    вложения (PDF, документы) наружу не попадают.
+    """
+    hashes = image_hashes(elements)
+    if not hashes:
+        return {}
+    rows = await session.execute(
+        select(Blob.sha256, Blob.content_type, Blob.variants).where(
+            Blob.sha256.in_(hashes),
+            exists().where(PageFile.page_id == page_id, PageFile.sha256 == Blob.sha256),
+        )
+    )
+    return {row.sha256: media_info(row.sha256, row.content_type, row.variants) for row in rows}
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from src.database import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class Blob(Base):
+    # содержимое файла по его SHA-256; refcount — сколько строк page_files на него ссылается
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    content_type: Mapped[str] = mapped_column(default="application/octet-stream")
+    refcount: Mapped[int] = mapped_column(default=0, server_default="0")
+    # уменьшенные копии картинки (src.blob.derivatives); None — ещё не строились
+    variants: Mapped[list[dict] | None] = mapped_column(JSONB, nullable=True)
+
+
+class Upload(Base):
+    # сессия докачки: принятые байты лежат в файле, смещение — его размер
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
+    page_id: Mapped[int] = mapped_column(ForeignKey('pages.id', ondelete='CASCADE'))
+    filename: Mapped[str]
+    size: Mapped[int] = mapped_column(BigInteger)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
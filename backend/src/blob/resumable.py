@@ -0,0 +1,129 @@
+"""
+Докачиваемые загрузки: создать сессию, слать куски PUT с offset,
+узнать текущий offset, завершить.
+
+Куски дописываются прямо в файл сессии, смещение — размер файла, так что
+после обрыва клиент досылает только недостающее. Один PUT на сессию за
+раз: файл берётся под flock, это работает и между воркерами. При
+завершении файл хешируется и становится блобом без копирования.
+"""
+import asyncio
+import fcntl
+import hashlib
+import os
+from pathlib import Path
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from src.blob.media import SNIFF_BYTES
+from src.blob.store import BLOB_TMP_DIR
+from src.page.upload import UPLOAD_CHUNK
+
+RESUMABLE_DIR = BLOB_TMP_DIR / "resumable"
+
+
+def upload_path(upload_id: str) -> Path:
+    return RESUMABLE_DIR / f"{upload_id}.part"
+
+
+def create_upload_file(upload_id: str) -> None:
+    RESUMABLE_DIR.mkdir(parents=True, exist_ok=True)
+    upload_path(upload_id).touch()
+
+
+def upload_offset(upload_id: str) -> int | None:
+    try:
+        return upload_path(upload_id).stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+def remove_upload_files(upload_ids: list[str]) -> None:
+    for upload_id in upload_ids:
+        upload_path(upload_id).unlink(missing_ok=True)
+
+
+def _offset_conflict(current: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": "Offset mismatch", "offset": current},
+        headers={"Upload-Offset": str(current)},
+    )
+
+
+def _open_at(upload_id: str, offset: int):
+    try:
+        file = open(upload_path(upload_id), "r+b")
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        file.close()
+        raise HTTPException(status_code=status.HTTP_423_LOCKED, detail="Another chunk is being written")
+    current = os.fstat(file.fileno()).st_size
+    if current != offset:
+        file.close()
+        raise _offset_conflict(current)
+    file.seek(offset)
+    return file
+
+
+async def append_chunk(request: Request, upload_id: str, offset: int, size: int) -> int:
+    """
+    Дописывает тело запроса с позиции offset. Принятое до обрыва
+    соединения сохраняется. Новый offset.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and offset + int(declared) > size:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Chunk goes past the declared size")
+    file = await run_in_threadpool(_open_at, upload_id, offset)
+    received = offset
+    pending = bytearray()
+    io: asyncio.Future | None = None
+    try:
+        async for chunk in request.stream():
+            if received + len(chunk) > size:
+                raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Chunk goes past the declared size")
+            received += len(chunk)
+            pending += chunk
+            if len(pending) >= UPLOAD_CHUNK:
+                # пишем порцию в потоке, пока принимается следующая
+                if io is not None:
+                    await io
+                io = asyncio.ensure_future(run_in_threadpool(file.write, bytes(pending)))
+                pending.clear()
+    except ClientDisconnect:
+        pass
+    finally:
+        try:
+            if io is not None:
+                await io
+            if pending:
+                await run_in_threadpool(file.write, bytes(pending))
+        finally:
+            # закрытие снимает flock
+            await run_in_threadpool(file.close)
+    return await run_in_threadpool(upload_offset, upload_id)
+
+
+def _hash_file(upload_id: str, size: int) -> tuple[str, bytes]:
+    # под тем же flock, что и PUT: файл не дописывают, пока его хешируют
+    with _open_at(upload_id, size) as file:
+        file.seek(0)
+        digest = hashlib.sha256()
+        head = b""
+        while chunk := file.read(UPLOAD_CHUNK):
+            head = head or chunk[:SNIFF_BYTES]
+            digest.update(chunk)
+        return digest.hexdigest(), head
+
+
+async def hash_upload(upload_id: str, size: int) -> tuple[str, bytes]:
+    """
+    SHA-256 и начало (для определения типа) принятого файла; 409 с текущим
+    offset, если он ещё не полный.
+    """
+    return await run_in_threadpool(_hash_file, upload_id, size)
@@ -0,0 +1,64 @@
+# src/blob/router.py
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from src.blob.dao import BlobDAO
+from src.blob.derivatives import VARIANT_FORMATS, variant_path
+from src.blob.media import file_response
+from src.blob.store import BLOB_CACHE_CONTROL, BLOB_PRIVATE_CACHE_CONTROL, blob_path, entry_sha256
+from src.http_cache import etag_matches
+from src.user.dependencies import get_optional_user
+
+router = APIRouter(prefix='/blob', tags=['Blobs'])
+
+VARIANT_NAME = re.compile(r"^(\d{1,5})\.([a-z]+)$")
+
+
+async def _readable(sha256: str, user) -> tuple[str, str] | None:
+    """(content_type, Cache-Control) или None, если блоб недоступен этому пользователю."""
+    access = await BlobDAO.get_readable(sha256, user.id if user else None)
+    if access is None:
+        return None
+    content_type, public = access
+    return content_type, BLOB_CACHE_CONTROL if public else BLOB_PRIVATE_CACHE_CONTROL
+
+
+@router.get("/{sha256}")
+async def get_blob(sha256: str, request: Request, user=Depends(get_optional_user)):
+    sha256 = sha256.lower()
+    # знание хеша не даёт доступа: блоб отдаётся, только если он в файлах
+    # опубликованной страницы или страницы самого пользователя
+    access = await _readable(sha256, user) if entry_sha256(sha256) == sha256 else None
+    if access is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blob not found")
+    content_type, cache_control = access
+    # содержимое по хешу не меняется: ETag — сам хеш
+    etag = f'"{sha256}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Range/If-Range для плееров и просмотрщиков PDF — в file_response
+    return file_response(blob_path(sha256), content_type, headers)
+
+
+@router.get("/{sha256}/{name}")
+async def get_blob_variant(sha256: str, name: str, request: Request, user=Depends(get_optional_user)):
+    # уменьшенная копия картинки: /blob/<хеш>/640.webp, доступ — как у самого блоба
+    sha256 = sha256.lower()
+    match = VARIANT_NAME.match(name)
+    if entry_sha256(sha256) != sha256 or not match or match.group(2) not in VARIANT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    access = await _readable(sha256, user)
+    if access is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    etag = f'"{sha256}-{name}"'
+    headers = {"ETag": etag, "Cache-Control": access[1]}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    path = variant_path(sha256, name)
+    if not await run_in_threadpool(path.is_file):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variant not found")
+    return file_response(path, VARIANT_FORMATS[match.group(2)][1], headers)
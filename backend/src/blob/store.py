@@ -0,0 +1,50 @@
+"""
+Файлы на диске по хешу содержимого: uploads/blobs/ab/abcdef...
+
+Файлы страниц (page_files.name) вида "<sha256>.<ext>" ссылаются на блоб, расширение
+остаётся для имени при скачивании. Одинаковые байты хранятся один раз,
+файл блоба никогда не меняется. Доступ к нему — нет (страницу снимают с
+публикации), поэтому общие кеши держат ответ недолго.
+"""
+import os
+import re
+from pathlib import Path
+
+BLOB_DIR = Path("uploads/blobs")
+# сюда пишутся загрузки до того, как станет известен хеш
+BLOB_TMP_DIR = BLOB_DIR / "tmp"
+BLOB_CACHE_CONTROL = "public, max-age=3600"
+# блоб виден только владельцу неопубликованной страницы
+BLOB_PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+_ENTRY = re.compile(r"^([0-9a-f]{64})(\.[0-9a-z]{1,10})?$")
+_SUFFIX = re.compile(r"^\.[0-9a-z]{1,10}$")
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOB_DIR / sha256[:2] / sha256
+
+
+def blob_entry(sha256: str, filename: str) -> str:
+    suffix = Path(filename).suffix.lower()
+    return sha256 + suffix if _SUFFIX.match(suffix) else sha256
+
+
+def entry_sha256(entry: str) -> str | None:
+    """Хеш из имени файла страницы или None для старых путей pages/{id}/..."""
+    match = _ENTRY.match(entry)
+    return match.group(1) if match else None
+
+
+def place_blob(tmp: Path, sha256: str) -> bool:
+    """
+    Переносит загрузку на место блоба. Если такие байты уже есть, временный
+    файл просто удаляется. True, если файл блоба записан.
+    """
+    path = blob_path(sha256)
+    if path.exists():
+        tmp.unlink(missing_ok=True)
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, path)
+    return True
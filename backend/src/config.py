@@ -10,6 +10,34 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     COMPOSE_PROJECT_NAME: str
+    QR_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    QR_CACHE_DISK_BYTES: int = 1024 * 1024 * 1024
+    QR_RENDER_WORKERS: int | None = None
+    FRONTEND_URL: str = "http://localhost:3000"
+    SHORT_LINK_BASE: str = "https://qrwear.app"
+    # ключ перестановки коротких кодов; смена ключа на живой базе даст коллизии
+    SHORT_CODE_KEY: str = "qrwear-short-codes"
+    SHORT_LINK_CACHE_SIZE: int = 100_000
+    SHORT_LINK_CACHE_TTL: float = 60.0
+    SCAN_BUFFER_CAPACITY: int = 100_000
+    SCAN_FLUSH_SIZE: int = 5_000
+    SCAN_FLUSH_INTERVAL: float = 1.0
+    SCAN_BACKPRESSURE_TIMEOUT: float = 0.05
+    PUBLIC_PAGE_CACHE_BYTES: int = 64 * 1024 * 1024
+    PUBLIC_PAGE_CACHE_TTL: float = 30.0
+    PAGE_SNAPSHOT_DEBOUNCE: float = 2.0
+    # история страницы: не чаще одной версии за интервал, полный снимок каждые N версий
+    PAGE_HISTORY_INTERVAL: float = 30.0
+    PAGE_HISTORY_SNAPSHOT_EVERY: int = 20
+    PAGE_HISTORY_RETENTION_DAYS: int = 30
+    PAGE_HISTORY_PRUNE_INTERVAL: float = 3600.0
+    # шрифт подписей на листах печати: путь или имя файла из системных шрифтов
+    QR_SHEET_FONT: str = "DejaVuSans.ttf"
+    # докачиваемые загрузки: предел размера файла и время жизни сессии
+    RESUMABLE_UPLOAD_MAX_BYTES: int = 1024 * 1024 * 1024
+    RESUMABLE_UPLOAD_TTL_HOURS: int = 24
+    # префикс internal-location nginx для X-Accel-Redirect ("/_files/"); пусто — файлы отдаёт приложение
+    FILE_ACCEL_REDIRECT: str | None = None
     
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"),
@@ -13,6 +13,21 @@ class BaseDAO:
         data = await session.execute(select(cls.model).filter_by(**filter_by))
         return data.scalars().all()
     
+    @classmethod
+    @with_session
+    async def get_keyset(cls, session, columns: list, after: int | None, limit: int, **filter_by):
+        """
+        Страница по курсору: только columns, строки с id > after по
+        возрастанию id. Возвращает (строки, курсор следующей страницы или None).
+        """
+        query = select(*columns).filter_by(**filter_by)
+        if after is not None:
+            query = query.where(cls.model.id > after)
+        data = await session.execute(query.order_by(cls.model.id).limit(limit + 1))
+        rows = data.all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
     @classmethod
     @with_session
     async def get_except_current(cls, session, current_id: int):
@@ -45,8 +60,8 @@ class BaseDAO:
             
     @classmethod
     @with_session
-    async def delete(cls, session, id: int):
-        check = await session.execute(delete(cls.model).where(cls.model.id == id))
+    async def delete(cls, session, id: int, **filter_by):
+        check = await session.execute(delete(cls.model).where(cls.model.id == id).filter_by(**filter_by))
         try:
             await session.commit()
         except SQLAlchemyError:
@@ -54,6 +69,31 @@ class BaseDAO:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
         return check.rowcount
     
+    @classmethod
+    @with_session
+    async def update_returning(cls, session, id: int, values: dict, **filter_by):
+        """
+        UPDATE ... RETURNING: изменение и чтение строки одним запросом,
+        условия владения (filter_by) — в WHERE. None, если строка не найдена.
+        """
+        if not values:
+            data = await session.execute(select(cls.model).where(cls.model.id == id).filter_by(**filter_by))
+            return data.scalar_one_or_none()
+        result = await session.execute(
+            update(cls.model)
+            .where(cls.model.id == id)
+            .filter_by(**filter_by)
+            .values(**values)
+            .returning(cls.model)
+        )
+        obj = result.scalar_one_or_none()
+        try:
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return obj
+
     @classmethod
     @with_session
     async def update(cls, session, id:int, **values):
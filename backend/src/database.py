@@ -4,11 +4,17 @@ from typing import Annotated
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, declared_attr, mapped_column, Mapped
 from sqlalchemy import func
+import pydantic_core
 from src.config import get_db_url
 
 
 DATABASE_URL = get_db_url()
-engine = create_async_engine(DATABASE_URL)
+# JSONB кодируется и разбирается pydantic-core, а не модулем json
+engine = create_async_engine(
+    DATABASE_URL,
+    json_serializer=lambda value: pydantic_core.to_json(value).decode(),
+    json_deserializer=pydantic_core.from_json,
+)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 def with_session(func):
     async def wrapper(*args, **kwargs):
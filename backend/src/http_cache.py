@@ -0,0 +1,11 @@
+"""Условные запросы: разбор If-None-Match."""
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Сравнение для If-None-Match (слабое, как требует RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
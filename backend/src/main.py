@@ -1,3 +1,6 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
@@ -8,8 +11,36 @@ from src.user.router import router as users_router
 from src.qr.router import router as qrs_router
 from src.page.router import router as pages_router
 from src.page.public_router import public_router
+from src.page.upload_router import upload_router
+from src.page.history_router import history_router
+from src.blob.router import router as blobs_router
+from src.qr.redirect_router import redirect_router
+from src.qr.cache import render_cache
+from src.qr.pool import shutdown_render_pool
+from src.qr.scans import scan_buffer
+from src.page.snapshot import snapshot_builder
+from src.page.history import history_recorder
+from src.blob.derivatives import derivative_builder
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scan_buffer.start()
+    history_recorder.start()
+    yield
+    await scan_buffer.close()
+    await history_recorder.close()
+    # копии картинок ставят пересборку снимков — закрываются раньше
+    await derivative_builder.close()
+    await snapshot_builder.close()
+    shutdown_render_pool()
+    # статистика кеша картинок QR общая для процесса — только в лог, не в API
+    logger.info("QR render cache: %s", render_cache.snapshot())
+
 
-app = FastAPI(title='QR')
+app = FastAPI(title='QR', lifespan=lifespan)
 PORT = 9000
 HOST = "0.0.0.0"
 
@@ -26,7 +57,12 @@ app.add_middleware(
 app.include_router(users_router)
 app.include_router(qrs_router)
 app.include_router(pages_router)
+app.include_router(upload_router)
+app.include_router(history_router)
 app.include_router(public_router)
+app.include_router(blobs_router)
+# последним: /{short_code} не должен перехватывать остальные маршруты
+app.include_router(redirect_router)
 
 
 @app.exception_handler(TokenExpiredException)
@@ -11,7 +11,8 @@ from alembic import context
 from src.database import Base, DATABASE_URL
 from src.user.models import User
 from src.qr.models import QR
-from src.page.models import Page
+from src.page.models import Page, PageFile, PageRevision
+from src.blob.models import Blob, Upload
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
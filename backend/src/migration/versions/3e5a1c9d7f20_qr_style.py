@@ -0,0 +1,28 @@
+"""qr_style
+
+Revision ID: 3e5a1c9d7f20
+Revises: 114182b9b604
+Create Date: 2026-01-12 14:03:27.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e5a1c9d7f20'
+down_revision: Union[str, Sequence[str], None] = '114182b9b604'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('qrs', sa.Column('qr_style', sa.JSON(), server_default='{}', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qrs', 'qr_style')
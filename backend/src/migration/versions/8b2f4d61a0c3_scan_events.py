@@ -0,0 +1,41 @@
+"""scan events
+
+Revision ID: 8b2f4d61a0c3
+Revises: 3e5a1c9d7f20
+Create Date: 2026-01-19 11:42:05.117384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2f4d61a0c3'
+down_revision: Union[str, Sequence[str], None] = '3e5a1c9d7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scanevents',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('qr_id', sa.Integer(), nullable=False),
+    sa.Column('scanned_at', sa.DateTime(), nullable=False),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('referrer', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['qr_id'], ['qrs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_scanevents_qr_id_scanned_at', 'scanevents', ['qr_id', 'scanned_at'], unique=False)
+    op.add_column('qrs', sa.Column('scan_count', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qrs', 'scan_count')
+    op.drop_index('ix_scanevents_qr_id_scanned_at', table_name='scanevents')
+    op.drop_table('scanevents')
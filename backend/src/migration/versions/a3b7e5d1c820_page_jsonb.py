@@ -0,0 +1,50 @@
+"""page jsonb
+
+Revision ID: a3b7e5d1c820
+Revises: f2a6d8c4e913
+Create Date: 2026-02-07 11:42:51.308174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3b7e5d1c820'
+down_revision: Union[str, Sequence[str], None] = 'f2a6d8c4e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = ('background', 'elements', 'theme_settings')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in JSON_COLUMNS:
+        op.alter_column(
+            'pages', column,
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            existing_type=sa.JSON(),
+            postgresql_using=f'{column}::jsonb',
+        )
+    op.create_index(
+        'ix_pages_elements', 'pages', ['elements'], unique=False,
+        postgresql_using='gin', postgresql_ops={'elements': 'jsonb_path_ops'},
+    )
+    op.create_index('ix_pages_files', 'pages', ['files'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pages_files', table_name='pages', postgresql_using='gin')
+    op.drop_index('ix_pages_elements', table_name='pages', postgresql_using='gin')
+    for column in JSON_COLUMNS:
+        op.alter_column(
+            'pages', column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(astext_type=sa.Text()),
+            postgresql_using=f'{column}::json',
+        )
@@ -0,0 +1,53 @@
+"""scan rollups
+
+Revision ID: c91e7a3b5d48
+Revises: 8b2f4d61a0c3
+Create Date: 2026-01-26 16:08:51.904217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91e7a3b5d48'
+down_revision: Union[str, Sequence[str], None] = '8b2f4d61a0c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUPS = (
+    ('qrscanhours', 'qr_id', 'qrs', 'hour'),
+    ('qrscandays', 'qr_id', 'qrs', 'day'),
+    ('userscanhours', 'user_id', 'users', 'hour'),
+    ('userscandays', 'user_id', 'users', 'day'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, key, parent, _ in ROLLUPS:
+        op.create_table(table,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('scans', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint([key], [f'{parent}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(key, 'bucket')
+        )
+
+    # переносим уже накопленные события
+    for table, key, _, unit in ROLLUPS:
+        source = 'scanevents e' if key == 'qr_id' else 'scanevents e JOIN qrs q ON q.id = e.qr_id'
+        column = 'e.qr_id' if key == 'qr_id' else 'q.user_id'
+        op.execute(
+            f"INSERT INTO {table} ({key}, bucket, scans) "
+            f"SELECT {column}, date_trunc('{unit}', e.scanned_at), count(*) FROM {source} GROUP BY 1, 2"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _, _, _ in reversed(ROLLUPS):
+        op.drop_table(table)
@@ -0,0 +1,91 @@
+"""short codes
+
+Revision ID: d4e8a2f6b190
+Revises: c91e7a3b5d48
+Create Date: 2026-01-28 11:42:17.508331
+
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Sequence, Union
+
+from alembic import op
+from dotenv import dotenv_values
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a2f6b190'
+down_revision: Union[str, Sequence[str], None] = 'c91e7a3b5d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Замороженная копия src/qr/shortcode.py на момент миграции: код приложения
+# может измениться, а выданные здесь коды — нет. Ключ берётся так же, как в
+# settings (окружение, затем backend/.env), иначе новые коды разойдутся с этими.
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+SHORT_CODE_BLOCK = 1000
+_HALF_BITS = 18
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+_ENV_FILE = Path(__file__).resolve().parents[3] / ".env"
+
+
+def _short_code_key() -> bytes:
+    key = os.environ.get("SHORT_CODE_KEY") or dotenv_values(_ENV_FILE).get("SHORT_CODE_KEY") or "qrwear-short-codes"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=32).digest()
+
+
+def _encode_short_code(number: int, key: bytes) -> str:
+    def round_(value: int, index: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(3, "big"), key=key, digest_size=3, person=index.to_bytes(16, "big")
+        ).digest()
+        return int.from_bytes(digest, "big") & _HALF_MASK
+
+    def feistel(value: int) -> int:
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for index in range(_ROUNDS):
+            left, right = right, left ^ round_(right, index)
+        return right << _HALF_BITS | left
+
+    value = feistel(number)
+    while value >= CODE_SPACE:
+        value = feistel(value)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, rem = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # шаг последовательности = размер блока, который резервирует воркер
+    op.execute(f"CREATE SEQUENCE qr_short_code_seq START 0 MINVALUE 0 INCREMENT BY {SHORT_CODE_BLOCK}")
+    op.add_column('qrs', sa.Column('short_code', sa.String(), nullable=True))
+
+    # существующим QR выдаём коды из первых блоков последовательности
+    conn = op.get_bind()
+    key = _short_code_key()
+    ids = conn.execute(sa.text("SELECT id FROM qrs ORDER BY id")).scalars().all()
+    for offset in range(0, len(ids), SHORT_CODE_BLOCK):
+        start = conn.execute(sa.text("SELECT nextval('qr_short_code_seq')")).scalar_one()
+        chunk = ids[offset:offset + SHORT_CODE_BLOCK]
+        conn.execute(
+            sa.text("UPDATE qrs SET short_code = :code WHERE id = :id"),
+            [{"id": qr_id, "code": _encode_short_code(start + i, key)} for i, qr_id in enumerate(chunk)],
+        )
+
+    op.alter_column('qrs', 'short_code', nullable=False)
+    op.create_unique_constraint(op.f('qrs_short_code_key'), 'qrs', ['short_code'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f('qrs_short_code_key'), 'qrs', type_='unique')
+    op.drop_column('qrs', 'short_code')
+    op.execute("DROP SEQUENCE qr_short_code_seq")
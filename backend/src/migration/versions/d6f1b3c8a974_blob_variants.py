@@ -0,0 +1,29 @@
+"""blob variants
+
+Revision ID: d6f1b3c8a974
+Revises: c4e9a1b7d362
+Create Date: 2026-02-12 13:21:40.872316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6f1b3c8a974'
+down_revision: Union[str, Sequence[str], None] = 'c4e9a1b7d362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('blobs', sa.Column('variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('blobs', 'variants')
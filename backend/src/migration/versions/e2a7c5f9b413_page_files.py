@@ -0,0 +1,62 @@
+"""page files
+
+Revision ID: e2a7c5f9b413
+Revises: d6f1b3c8a974
+Create Date: 2026-02-16 10:48:05.193742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c5f9b413'
+down_revision: Union[str, Sequence[str], None] = 'd6f1b3c8a974'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'page_files',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('page_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # порядок массива сохраняется в порядке id
+    op.execute("""
+        INSERT INTO page_files (page_id, name, sha256, size, content_type)
+        SELECT p.id, f.name, b.sha256, b.size, b.content_type
+        FROM pages p
+        CROSS JOIN LATERAL unnest(p.files) WITH ORDINALITY AS f(name, position)
+        LEFT JOIN blobs b ON b.sha256 = substring(f.name FROM '^([0-9a-f]{64})(\\.[0-9a-z]{1,10})?$')
+        ORDER BY p.id, f.position
+    """)
+    op.create_index('ix_page_files_page_id_id', 'page_files', ['page_id', 'id'], unique=False)
+    op.create_index('ix_page_files_sha256', 'page_files', ['sha256'], unique=False)
+    op.drop_index('ix_pages_files', table_name='pages', postgresql_using='gin')
+    op.drop_column('pages', 'files')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('pages', sa.Column('files', sa.ARRAY(sa.String()), server_default='{}', nullable=False))
+    op.execute("""
+        UPDATE pages p SET files = f.files
+        FROM (SELECT page_id, array_agg(name ORDER BY id) AS files FROM page_files GROUP BY page_id) f
+        WHERE f.page_id = p.id
+    """)
+    op.alter_column('pages', 'files', server_default=None)
+    op.create_index('ix_pages_files', 'pages', ['files'], unique=False, postgresql_using='gin')
+    op.drop_index('ix_page_files_sha256', table_name='page_files')
+    op.drop_index('ix_page_files_page_id_id', table_name='page_files')
+    op.drop_table('page_files')
@@ -0,0 +1,30 @@
+"""keyset indexes
+
+Revision ID: e7c3b19a5f42
+Revises: d4e8a2f6b190
+Create Date: 2026-02-02 10:15:33.720941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c3b19a5f42'
+down_revision: Union[str, Sequence[str], None] = 'd4e8a2f6b190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_qrs_user_id_id', 'qrs', ['user_id', 'id'], unique=False)
+    op.create_index('ix_pages_user_id_id', 'pages', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pages_user_id_id', table_name='pages')
+    op.drop_index('ix_qrs_user_id_id', table_name='qrs')
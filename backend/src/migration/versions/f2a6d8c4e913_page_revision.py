@@ -0,0 +1,28 @@
+"""page revision
+
+Revision ID: f2a6d8c4e913
+Revises: e7c3b19a5f42
+Create Date: 2026-02-05 14:27:08.163552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6d8c4e913'
+down_revision: Union[str, Sequence[str], None] = 'e7c3b19a5f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pages', sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('pages', 'revision')
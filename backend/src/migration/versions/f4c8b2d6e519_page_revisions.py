@@ -0,0 +1,44 @@
+"""page revisions
+
+Revision ID: f4c8b2d6e519
+Revises: e2a7c5f9b413
+Create Date: 2026-02-19 15:07:32.614089
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8b2d6e519'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c5f9b413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'page_revisions',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('page_id', sa.Integer(), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['page_id'], ['pages.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_page_revisions_page_id_revision', 'page_revisions', ['page_id', 'revision'], unique=True)
+    op.create_index('ix_page_revisions_created_at', 'page_revisions', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_page_revisions_created_at', table_name='page_revisions')
+    op.drop_index('ix_page_revisions_page_id_revision', table_name='page_revisions')
+    op.drop_table('page_revisions')
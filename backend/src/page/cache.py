@@ -0,0 +1,126 @@
+"""
+Кеш готовых ответов публичных страниц: имя страницы -> сериализованный JSON.
+
+Просмотры на порядки чаще правок, поэтому попадание не ходит в БД и не
+пересобирает словарь. Записи сбрасываются из PageDAO после коммита; на
+промахе загрузка одна на ключ (single flight), остальные запросы ждут её.
+У каждого воркера свой кеш, TTL ограничивает устаревание после правок,
+сделанных другим воркером.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from src.config import settings
+
+
+@dataclass(slots=True)
+class CachedPage:
+    page_id: int
+    etag: str
+    body: bytes
+    expires: float
+
+
+class PublicPageCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items: OrderedDict[str, CachedPage] = OrderedDict()
+        self._by_page: dict[int, str] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        # растёт при каждом сбросе: загрузка, начатая до сброса, не кладётся в кеш
+        self._epoch = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, name: str) -> CachedPage | None:
+        item = self._items.get(name)
+        if item is None:
+            return None
+        if item.expires < time.monotonic():
+            self._drop(name)
+            return None
+        self._items.move_to_end(name)
+        return item
+
+    def _put(self, name: str, page_id: int, etag: str, body: bytes) -> CachedPage:
+        item = CachedPage(page_id, etag, body, time.monotonic() + self.ttl)
+        if len(body) > self.max_bytes:
+            return item
+        self._drop(name)
+        self._items[name] = item
+        self._by_page[page_id] = name
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._items)))
+        return item
+
+    def _drop(self, name: str) -> None:
+        item = self._items.pop(name, None)
+        if item is None:
+            return
+        self._bytes -= len(item.body)
+        if self._by_page.get(item.page_id) == name:
+            del self._by_page[item.page_id]
+
+    async def _load(
+        self, name: str, load: Callable[[str], Awaitable[tuple[int, str, bytes] | None]]
+    ) -> CachedPage | None:
+        epoch = self._epoch
+        loaded = await load(name)
+        if loaded is None:
+            return None
+        if epoch != self._epoch:
+            return CachedPage(*loaded, 0.0)
+        return self._put(name, *loaded)
+
+    async def get_or_load(
+        self, name: str, load: Callable[[str], Awaitable[tuple[int, str, bytes] | None]]
+    ) -> CachedPage | None:
+        """
+        load(name) -> (page_id, etag, тело) или None, если страницы нет. Отсутствие
+        не кешируется: страницу с этим именем могут создать в любой момент.
+        """
+        item = self._get(name)
+        if item is not None:
+            self.hits += 1
+            return item
+
+        future = self._inflight.get(name)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self._load(name, load))
+            self._inflight[name] = future
+            future.add_done_callback(lambda done: self._forget(name, done))
+        # shield: отключившийся клиент не отменяет загрузку для остальных
+        return await asyncio.shield(future)
+
+    def _forget(self, name: str, future: asyncio.Future) -> None:
+        if self._inflight.get(name) is future:
+            del self._inflight[name]
+
+    def invalidate_page(self, page_id: int) -> None:
+        self._epoch += 1
+        # новые запросы не должны присоединяться к загрузке, начатой до правки
+        self._inflight.clear()
+        name = self._by_page.get(page_id)
+        if name is not None:
+            self._drop(name)
+
+    def snapshot(self) -> dict:
+        return {
+            "items": len(self._items),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+public_page_cache = PublicPageCache(
+    max_bytes=settings.PUBLIC_PAGE_CACHE_BYTES,
+    ttl=settings.PUBLIC_PAGE_CACHE_TTL,
+)
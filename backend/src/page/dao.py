@@ -1,17 +1,76 @@
 from src.dao.base import BaseDAO
-from src.page.models import Page
+from src.page.models import Page, PageFile, PageRevision
 from src.database import with_session
 from fastapi import HTTPException, status
 from sqlalchemy.exc import SQLAlchemyError
 from src.qr.models import QR
-from sqlalchemy import select, update
+from sqlalchemy import bindparam, delete, exists, func, literal, not_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.types import Text
+from src.qr.redirect import link_cache, page_view_url
+from src.page.cache import public_page_cache
+from src.page.snapshot import snapshot_builder
+from src.page.history import history_recorder, load_document
+from src.page.patch import PatchError
+from src.page.schemas import check_element
+from pydantic import ValidationError
+from src.blob.dao import BlobDAO
+
+
+def _elements_with_changes(upsert: list[dict], delete: list[str]):
+    """
+    SQL-выражение нового elements для upsert/delete по id (как
+    apply_element_changes): заменённые элементы остаются на своих местах,
+    новые дописываются в конец. Сравнение id — как текст.
+    """
+    existing = func.jsonb_array_elements(Page.elements).table_valued("value", with_ordinality="ord").render_derived("e")
+    upserts = func.jsonb_array_elements(
+        bindparam("upsert", upsert, type_=JSONB)
+    ).table_valued("value", with_ordinality="ord").render_derived("u")
+    deleted = bindparam("delete", delete, type_=ARRAY(Text))
+    existing_id = existing.c.value.op("->>")("id")
+    upsert_id = upserts.c.value.op("->>")("id")
+    empty = literal([], JSONB)
+
+    def is_deleted(element_id):
+        # coalesce: NOT (... = ANY) иначе свернётся в != ANY, а у элементов без id — NULL
+        return func.coalesce(element_id == func.any(deleted), False)
+
+    kept = (
+        select(func.jsonb_agg(aggregate_order_by(func.coalesce(upserts.c.value, existing.c.value), existing.c.ord)))
+        .select_from(existing.outerjoin(upserts, upsert_id == existing_id))
+        .where(not_(is_deleted(existing_id)))
+        .scalar_subquery()
+    )
+    appended = (
+        select(func.jsonb_agg(aggregate_order_by(upserts.c.value, upserts.c.ord)))
+        .where(
+            not_(is_deleted(upsert_id)),
+            ~exists().select_from(existing).where(existing_id == upsert_id),
+        )
+        .scalar_subquery()
+    )
+    return func.coalesce(kept, empty).op("||")(func.coalesce(appended, empty))
+
 
 class PageDAO(BaseDAO):
     model = Page
     
     @classmethod
     @with_session
-    async def add(cls, session, user_id: int, name: str, background: dict, elements: list, files: list, qr_id: int | None = None):
+    async def add(
+        cls,
+        session,
+        user_id: int,
+        name: str,
+        background: dict,
+        elements: list,
+        qr_id: int | None = None,
+        title: str = "",
+        description: str | None = None,
+        theme_settings: dict | None = None,
+    ):
         existing = await session.execute(select(cls.model).filter_by(name=name))
         if existing.scalar_one_or_none():
             raise HTTPException(
@@ -23,10 +82,13 @@ class PageDAO(BaseDAO):
         user_id=user_id,
         qr_id=qr_id,
         name=name,
+        title=title,
+        description=description,
         background=background,
-        elements=elements,
-        files=files
+        elements=elements
     )
+        if theme_settings is not None:
+            page.theme_settings = theme_settings
         session.add(page)
         await session.flush()
     
@@ -35,9 +97,8 @@ class PageDAO(BaseDAO):
             if not qr:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="QR not found")
         
-            # Исправленная ссылка - должен быть shortCode из QR
-            # Предполагаем, что QR имеет поле short_code
-            qr.link = f"https://qrwear.app/{qr.short_code}"
+            # как в update_returning: QR ведёт на страницу, а не на свой короткий адрес
+            qr.link = page_view_url(page.id)
             session.add(qr)
 
         try:
@@ -46,30 +107,292 @@ class PageDAO(BaseDAO):
         except SQLAlchemyError as e:
             await session.rollback()
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if qr_id:
+            link_cache.invalidate_qr(qr_id)
+        snapshot_builder.schedule(page.id)
+        history_recorder.schedule(page.id)
         return page
     
     @classmethod
     @with_session
-    async def update(cls, session, id: int, **values):
+    async def update_returning(cls, session, id: int, values: dict, user_id: int):
+        """
+        Сохранение из редактора одним запросом. Владение страницей и QR —
+        в WHERE, перепривязка ссылки QR — data-modifying CTE в том же запросе.
+        None, если страница (или привязываемый QR) не найдены у пользователя.
+        """
+        if not values:
+            return await session.scalar(select(Page).where(Page.id == id, Page.user_id == user_id))
+
         qr_id = values.get('qr_id')
-        name = values.get('name')
-        
-        if qr_id is not None or name is not None:
-            page = await session.get(cls.model, id)
-            if not page:
+        query = update(Page).where(Page.id == id, Page.user_id == user_id)
+        if qr_id is not None:
+            query = query.where(exists().where(QR.id == qr_id, QR.user_id == user_id))
+        page = query.values(**values, revision=Page.revision + 1).returning(*Page.__table__.c).cte("page")
+        statement = select(page)
+        if qr_id is not None:
+            statement = statement.add_cte(
+                update(QR)
+                .where(QR.id == page.c.qr_id)
+                .values(link=func.concat(page_view_url(""), page.c.id))
+                .cte("qr")
+            )
+
+        try:
+            row = (await session.execute(statement)).first()
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        link_cache.invalidate_page(id)
+        public_page_cache.invalidate_page(id)
+        if row is not None:
+            snapshot_builder.schedule(id)
+            history_recorder.schedule(id)
+        if qr_id is not None:
+            link_cache.invalidate_qr(qr_id)
+        return row
+
+    @classmethod
+    async def _write(cls, session, id: int, user_id: int, revision: int, **values) -> int:
+        """
+        Запись полей (значения или SQL-выражения), только если ревизия не
+        сдвинулась. Новая ревизия; 404 — страницы нет, 409 — с текущей ревизией.
+        """
+        new_revision = await session.scalar(
+            update(Page)
+            .where(Page.id == id, Page.user_id == user_id, Page.revision == revision)
+            .values(**values, revision=Page.revision + 1)
+            .returning(Page.revision)
+        )
+        if new_revision is None:
+            await session.rollback()
+            current = await session.scalar(select(Page.revision).where(Page.id == id, Page.user_id == user_id))
+            if current is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
-            
-            if qr_id is not None:
-                qr = await session.get(QR, qr_id)
-                if not qr:
-                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="QR not found")
-                qr.link = f"https://##/pages/{name or page.name}"
-                session.add(qr)
-
-        result = await session.execute(update(cls.model).where(cls.model.id == id).values(**values))
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Page was modified", "revision": current},
+            )
+        try:
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        link_cache.invalidate_page(id)
+        public_page_cache.invalidate_page(id)
+        snapshot_builder.schedule(id)
+        history_recorder.schedule(id)
+        return new_revision
+
+    @classmethod
+    @with_session
+    async def patch_elements(cls, session, id: int, user_id: int, revision: int, apply):
+        """
+        Дельта-правка elements с оптимистичной блокировкой: apply(elements)
+        меняет список в Python, запись — через _write.
+        """
+        row = (await session.execute(
+            select(Page.elements, Page.revision).where(Page.id == id, Page.user_id == user_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
+        if row.revision != revision:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Page was modified", "revision": row.revision},
+            )
+        try:
+            elements = apply(list(row.elements or []))
+        except PatchError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        return await cls._write(session, id, user_id, revision, elements=elements)
+
+    @classmethod
+    @with_session
+    async def change_elements(cls, session, id: int, user_id: int, revision: int, upsert: list[dict], delete: list):
+        """
+        Upsert/delete по id целиком в БД: список элементов не читается в
+        Python, в запрос уходят только изменённые элементы.
+        """
+        if any("id" not in element for element in upsert):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Upserted element has no 'id'")
+        # повторный id в upsert — побеждает последний, как в apply_element_changes
+        upsert = list({str(element["id"]): element for element in upsert}.values())
+        elements = _elements_with_changes(upsert, [str(key) for key in delete])
+        return await cls._write(session, id, user_id, revision, elements=elements)
+
+    @classmethod
+    @with_session
+    async def merge_element(cls, session, id: int, user_id: int, revision: int, element_id: str, fields: dict):
+        """
+        Частичное обновление одного элемента: читается только он, fields
+        сливаются с ним и результат проверяется по его type; в строку
+        пишется jsonb_set по позиции. Ревизия в WHERE гарантирует, что
+        между чтением и записью список не менялся. 404, если элемента нет.
+        """
+        existing = func.jsonb_array_elements(Page.elements).table_valued("value", with_ordinality="ord").render_derived("e")
+        found = (await session.execute(
+            select(existing.c.ord - 1, existing.c.value)
+            .select_from(Page)
+            .join_from(Page, existing, literal(True))
+            .where(Page.id == id, Page.user_id == user_id, existing.c.value.op("->>")("id") == str(element_id))
+            .limit(1)
+        )).first()
+        if found is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Element not found")
+        position, element = found
+        try:
+            merged = check_element({**element, **fields})
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Invalid element: {e.errors(include_url=False, include_input=False)}",
+            )
+        elements = func.jsonb_set(
+            Page.elements,
+            bindparam("path", [str(position)], type_=ARRAY(Text)),
+            bindparam("element", merged, type_=JSONB),
+        )
+        return await cls._write(session, id, user_id, revision, elements=elements)
+
+    @classmethod
+    @with_session
+    async def restore(cls, session, id: int, user_id: int, revision: int, document: dict) -> int:
+        """Содержимое старой версии становится новой ревизией; история не переписывается."""
+        return await cls._write(session, id, user_id, revision, **document)
+
+    @classmethod
+    @with_session
+    async def find_by_element(cls, session, match: dict, **filter_by) -> list[int]:
+        """Id страниц, где есть элемент с полями match (elements @> [match], GIN)."""
+        data = await session.execute(
+            select(Page.id).filter_by(**filter_by).where(Page.elements.contains([match])).order_by(Page.id)
+        )
+        return list(data.scalars())
+
+    @classmethod
+    @with_session
+    async def find_by_file(cls, session, path: str, **filter_by) -> list[int]:
+        """Id страниц, ссылающихся на файл: в page_files или в content элемента."""
+        data = await session.execute(
+            select(Page.id)
+            .filter_by(**filter_by)
+            .where(
+                exists().where(PageFile.page_id == Page.id, PageFile.name == path)
+                | Page.elements.contains([{"content": path}])
+            )
+            .order_by(Page.id)
+        )
+        return list(data.scalars())
+
+    @classmethod
+    @with_session
+    async def delete(cls, session, id: int, **filter_by):
+        # строка страницы под FOR UPDATE: параллельная вставка в page_files
+        # ждёт (FK) и не потеряет ссылку на блоб
+        page = (await session.execute(
+            select(Page.id, Page.qr_id).where(Page.id == id).filter_by(**filter_by).with_for_update()
+        )).first()
+        page_id = page.id if page is not None else None
+        names = []
+        if page is not None:
+            names = list(await session.scalars(select(PageFile.name).where(PageFile.page_id == id)))
+            if page.qr_id is not None:
+                # ссылка вела на удаляемую страницу: QR остаётся без цели (404), а не со старым адресом
+                await session.execute(update(QR).where(QR.id == page.qr_id).values(link=None))
+            await session.execute(delete(Page).where(Page.id == id))
+        try:
+            await session.commit()
+        except SQLAlchemyError:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+        link_cache.invalidate_page(id)
+        public_page_cache.invalidate_page(id)
+        if page_id is None:
+            return 0
+        if page.qr_id is not None:
+            link_cache.invalidate_qr(page.qr_id)
+        snapshot_builder.schedule(id)  # сборка увидит, что страницы нет, и удалит снимок
+        await BlobDAO.release(names)
+        return 1
+
+
+class PageFileDAO(BaseDAO):
+    model = PageFile
+
+    @staticmethod
+    def _changed(page_id: int) -> None:
+        # список файлов входит в публичный ответ и снимок
+        public_page_cache.invalidate_page(page_id)
+        snapshot_builder.schedule(page_id)
+
+    @classmethod
+    @with_session
+    async def append(cls, session, page_id: int, files: list[dict]) -> int:
+        """
+        Добавление файлов одним INSERT, без чтения списка: параллельные
+        загрузки не затирают друг друга. Число файлов страницы после вставки.
+        """
+        try:
+            await session.execute(insert(PageFile), [{"page_id": page_id, **file} for file in files])
+            total = await session.scalar(select(func.count()).where(PageFile.page_id == page_id))
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        cls._changed(page_id)
+        return total
+
+    @classmethod
+    @with_session
+    async def find(cls, session, page_id: int, name: str) -> PageFile | None:
+        # имя не уникально: один файл можно прикрепить дважды
+        return await session.scalar(
+            select(PageFile).where(PageFile.page_id == page_id, PageFile.name == name).order_by(PageFile.id).limit(1)
+        )
+
+    @classmethod
+    @with_session
+    async def remove(cls, session, page_id: int, name: str) -> int | None:
+        """Удаляет один файл с этим именем. Число оставшихся или None, если файла не было."""
+        target = (
+            select(PageFile.id)
+            .where(PageFile.page_id == page_id, PageFile.name == name)
+            .order_by(PageFile.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        removed = await session.scalar(delete(PageFile).where(PageFile.id == target).returning(PageFile.id))
+        total = await session.scalar(select(func.count()).where(PageFile.page_id == page_id))
         try:
             await session.commit()
         except SQLAlchemyError:
             await session.rollback()
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
-        return result.rowcount
\ No newline at end of file
+        if removed is None:
+            return None
+        cls._changed(page_id)
+        return total
+
+
+class PageRevisionDAO(BaseDAO):
+    model = PageRevision
+
+    @classmethod
+    @with_session
+    async def get_history(cls, session, page_id: int, before: int | None, limit: int):
+        """Версии от новых к старым; курсор — ревизия, с которой продолжать."""
+        query = select(
+            PageRevision.revision, PageRevision.depth, PageRevision.size, PageRevision.created_at
+        ).where(PageRevision.page_id == page_id)
+        if before is not None:
+            query = query.where(PageRevision.revision < before)
+        rows = (await session.execute(query.order_by(PageRevision.revision.desc()).limit(limit + 1))).all()
+        next_cursor = rows[limit - 1].revision if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    @classmethod
+    @with_session
+    async def get_document(cls, session, page_id: int, revision: int) -> dict | None:
+        return await load_document(session, page_id, revision)
@@ -0,0 +1,222 @@
+"""
+История содержимого страницы.
+
+Версия — состояние полей HISTORY_FIELDS на какой-то ревизии страницы.
+Хранится не копия на каждое автосохранение, а цепочка: полный снимок
+(depth 0), за ним дельты JSON Patch к предыдущей версии. Каждые
+PAGE_HISTORY_SNAPSHOT_EVERY версий (или когда дельта не меньше половины
+документа) пишется новый снимок, так что восстановление любой версии —
+один запрос и не больше N применений патча. Размер истории растёт с
+объёмом правок, а не с числом сохранений.
+
+Запись идёт в фоне: после сохранения страница ставится в очередь, и за
+PAGE_HISTORY_INTERVAL секунд пишется не больше одной версии. Там же раз
+в PAGE_HISTORY_PRUNE_INTERVAL удаляются версии старше срока хранения.
+"""
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+
+from src.config import settings
+from src.database import async_session_maker
+from src.page.models import Page, PageRevision
+from src.page.patch import apply_json_patch, diff_json
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FIELDS = ("title", "description", "background", "elements", "theme_settings")
+# ключ advisory-блокировки: версии одной страницы пишутся по очереди и между процессами
+HISTORY_LOCK = 0x5047
+
+
+def page_document(page) -> dict:
+    return {field: getattr(page, field) for field in HISTORY_FIELDS}
+
+
+def _replay(rows: list) -> dict:
+    document = rows[0].data
+    for row in rows[1:]:
+        apply_json_patch(document, row.data)
+    return document
+
+
+async def load_document(session, page_id: int, revision: int) -> dict | None:
+    """Содержимое страницы на записанной версии: ближайший снимок и дельты после него."""
+    snapshot = (
+        select(func.max(PageRevision.revision))
+        .where(PageRevision.page_id == page_id, PageRevision.revision <= revision, PageRevision.depth == 0)
+        .scalar_subquery()
+    )
+    rows = (await session.execute(
+        select(PageRevision.revision, PageRevision.data)
+        .where(PageRevision.page_id == page_id, PageRevision.revision >= snapshot, PageRevision.revision <= revision)
+        .order_by(PageRevision.revision)
+    )).all()
+    if not rows or rows[-1].revision != revision:
+        return None
+    return await run_in_threadpool(_replay, rows)
+
+
+def _prepare(base: dict | None, document: dict, depth: int, snapshot_every: int) -> tuple[int, dict | list, int] | None:
+    """(depth, data, size) новой записи или None, если содержимое не менялось."""
+    if base == document:
+        return None
+    full = json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+    if base is not None and depth + 1 < snapshot_every:
+        operations = diff_json(base, document)
+        delta = json.dumps(operations, ensure_ascii=False, separators=(",", ":"))
+        if len(delta) * 2 < len(full):
+            return depth + 1, operations, len(delta)
+    return 0, document, len(full)
+
+
+class HistoryRecorder:
+    def __init__(self, interval: float, snapshot_every: int, retention_days: int, prune_interval: float):
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        self._dirty: set[int] = set()
+        self._prune_task: asyncio.Task | None = None
+        self.recorded = 0
+        self.pruned = 0
+        self.failures = 0
+
+    def schedule(self, page_id: int) -> None:
+        """
+        Вызывается после коммита. Таймер не переносится: при непрерывной
+        правке версия пишется раз в interval, а не после паузы.
+        """
+        if page_id not in self._timers:
+            self._timers[page_id] = asyncio.get_running_loop().call_later(self.interval, self._fire, page_id)
+
+    def _fire(self, page_id: int) -> None:
+        self._timers.pop(page_id, None)
+        if page_id in self._running:
+            self._dirty.add(page_id)
+            return
+        task = asyncio.create_task(self._run(page_id))
+        self._running[page_id] = task
+        task.add_done_callback(lambda _: self._done(page_id))
+
+    def _done(self, page_id: int) -> None:
+        del self._running[page_id]
+        if page_id in self._dirty:
+            self._dirty.discard(page_id)
+            self._fire(page_id)
+
+    async def capture(self, page_id: int) -> None:
+        """Записывает текущее состояние сразу — перед восстановлением старой версии."""
+        timer = self._timers.pop(page_id, None)
+        if timer is not None:
+            timer.cancel()
+        if page_id in self._running:
+            await asyncio.gather(self._running[page_id], return_exceptions=True)
+        await self._run(page_id)
+
+    async def _run(self, page_id: int) -> None:
+        try:
+            if await self._record(page_id):
+                self.recorded += 1
+        except Exception:
+            self.failures += 1
+            logger.exception("Page history record failed for page %d", page_id)
+
+    async def _record(self, page_id: int) -> bool:
+        async with async_session_maker() as session:
+            await session.execute(select(func.pg_advisory_xact_lock(HISTORY_LOCK, page_id)))
+            page = (await session.execute(
+                select(Page.revision, *(getattr(Page, field) for field in HISTORY_FIELDS)).where(Page.id == page_id)
+            )).first()
+            if page is None:
+                return False
+            last = (await session.execute(
+                select(PageRevision.revision, PageRevision.depth)
+                .where(PageRevision.page_id == page_id)
+                .order_by(PageRevision.revision.desc())
+                .limit(1)
+            )).first()
+            if last is not None and last.revision >= page.revision:
+                return False
+            base = await load_document(session, page_id, last.revision) if last is not None else None
+            prepared = await run_in_threadpool(
+                _prepare, base, page_document(page), last.depth if last is not None else 0, self.snapshot_every
+            )
+            if prepared is None:
+                return False
+            depth, data, size = prepared
+            session.add(PageRevision(page_id=page_id, revision=page.revision, depth=depth, data=data, size=size))
+            await session.commit()
+        return True
+
+    async def prune(self) -> int:
+        """
+        Удаляет версии старше срока хранения. Последний старый снимок
+        страницы остаётся: от него восстанавливаются более новые дельты.
+        """
+        keep = (
+            select(PageRevision.page_id, func.max(PageRevision.revision).label("revision"))
+            .where(
+                PageRevision.depth == 0,
+                PageRevision.created_at < func.now() - timedelta(days=self.retention_days),
+            )
+            .group_by(PageRevision.page_id)
+            .subquery()
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(
+                delete(PageRevision).where(PageRevision.page_id == keep.c.page_id, PageRevision.revision < keep.c.revision)
+            )
+            await session.commit()
+        return result.rowcount
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                self.pruned += await self.prune()
+            except Exception:
+                self.failures += 1
+                logger.exception("Page history pruning failed")
+            await asyncio.sleep(self.prune_interval)
+
+    def start(self) -> None:
+        if self._prune_task is None:
+            self._prune_task = asyncio.create_task(self._prune_loop())
+
+    async def close(self) -> None:
+        """При остановке пишет отложенные версии сразу."""
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+        pending = list(self._timers)
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for page_id in pending:
+            self._fire(page_id)
+        while self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "scheduled": len(self._timers),
+            "running": len(self._running),
+            "recorded": self.recorded,
+            "pruned": self.pruned,
+            "failures": self.failures,
+        }
+
+
+history_recorder = HistoryRecorder(
+    interval=settings.PAGE_HISTORY_INTERVAL,
+    snapshot_every=settings.PAGE_HISTORY_SNAPSHOT_EVERY,
+    retention_days=settings.PAGE_HISTORY_RETENTION_DAYS,
+    prune_interval=settings.PAGE_HISTORY_PRUNE_INTERVAL,
+)
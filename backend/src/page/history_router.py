@@ -0,0 +1,64 @@
+# src/page/history_router.py
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.page.dao import PageDAO, PageRevisionDAO
+from src.page.history import history_recorder
+from src.page.schemas import PageRevisionContent, PageRevisionListOut, PageRevisionOut, RevisionRestore
+from src.user.dependencies import get_current_user
+
+# история содержимого: список версий, просмотр и восстановление
+history_router = APIRouter(prefix='/page', tags=['Page History'])
+
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+
+
+async def _check_owner(page_id: int, user_id: int) -> None:
+    if not await PageDAO.get_one_or_none(id=page_id, user_id=user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
+
+
+async def _get_document(page_id: int, revision: int) -> dict:
+    document = await PageRevisionDAO.get_document(page_id=page_id, revision=revision)
+    if document is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found")
+    return document
+
+
+@history_router.get("/{page_id}/revisions/", response_model=PageRevisionListOut)
+async def list_revisions(
+    page_id: int,
+    before: int | None = Query(None, ge=1),
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+    user: str = Depends(get_current_user),
+):
+    await _check_owner(page_id, user.id)
+    rows, next_cursor = await PageRevisionDAO.get_history(page_id=page_id, before=before, limit=limit)
+    items = [
+        PageRevisionOut(revision=row.revision, snapshot=row.depth == 0, size=row.size, created_at=row.created_at)
+        for row in rows
+    ]
+    return PageRevisionListOut(items=items, next_cursor=next_cursor)
+
+
+@history_router.get("/{page_id}/revisions/{revision}/", response_model=PageRevisionContent)
+async def get_revision(page_id: int, revision: int, user: str = Depends(get_current_user)):
+    await _check_owner(page_id, user.id)
+    return PageRevisionContent(revision=revision, **await _get_document(page_id, revision))
+
+
+@history_router.post("/{page_id}/revisions/{revision}/restore/", response_model=PageRevisionContent)
+async def restore_revision(
+    page_id: int,
+    revision: int,
+    restore: RevisionRestore,
+    user: str = Depends(get_current_user),
+):
+    await _check_owner(page_id, user.id)
+    document = await _get_document(page_id, revision)
+    # текущее состояние попадает в историю до перезаписи: восстановление можно отменить
+    await history_recorder.capture(page_id)
+    new_revision = await PageDAO.restore(
+        id=page_id, user_id=user.id, revision=restore.revision, document=document
+    )
+    return PageRevisionContent(revision=new_revision, **document)
@@ -1,4 +1,15 @@
-from src.page.dao import PageDAO
+from src.blob.dao import BlobDAO
+from src.page.dao import PageDAO, PageFileDAO
 
 class PageLogic(PageDAO):
-    ...
\ No newline at end of file
+    @classmethod
+    async def attach_files(cls, page_id: int, files: list[dict]) -> int:
+        """
+        Добавляет строки page_files. Ссылки на блобы уже взяты (acquire):
+        если вставка не удалась, они отпускаются. Число файлов страницы.
+        """
+        try:
+            return await PageFileDAO.append(page_id=page_id, files=files)
+        except BaseException:
+            await BlobDAO.release([file["name"] for file in files])
+            raise
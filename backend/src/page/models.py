@@ -1,6 +1,7 @@
 from src.database import Base, int_pk, str_uniq
 from sqlalchemy.orm import Mapped, relationship, mapped_column
-from sqlalchemy import ARRAY, ForeignKey, JSON, String
+from sqlalchemy import BigInteger, ForeignKey, Index, String
+from sqlalchemy.dialects.postgresql import JSONB
 from src.qr.models import QR
 from src.user.models import User
 
@@ -11,14 +12,60 @@ class Page(Base):
     name: Mapped[str_uniq]
     title: Mapped[str] = mapped_column(default="")  # Отображаемое название
     description: Mapped[str | None] = mapped_column(nullable=True)
-    files: Mapped[list[str]] = mapped_column(ARRAY(String), default = lambda : [])
-    background: Mapped[dict] = mapped_column(JSON, default={})
-    elements: Mapped[list[dict]] = mapped_column(JSON, default=[])
+    background: Mapped[dict] = mapped_column(JSONB, default={})
+    elements: Mapped[list[dict]] = mapped_column(JSONB, default=[])
     published: Mapped[bool] = mapped_column(default=True)  # Добавить!
-    theme_settings: Mapped[dict] = mapped_column(JSON, default={
+    # растёт при каждом сохранении, из неё строится ETag публичной страницы
+    revision: Mapped[int] = mapped_column(default=1, server_default="1")
+    theme_settings: Mapped[dict] = mapped_column(JSONB, default={
         "textColor": "#ffffff",
         "accentColor": "#7c6afa"
     })
     
     qr: Mapped['QR'] = relationship("QR", back_populates='page', uselist=False)
-    user: Mapped['User'] = relationship("User")
\ No newline at end of file
+    user: Mapped['User'] = relationship("User")
+
+    __table_args__ = (
+        Index('ix_pages_user_id_id', 'user_id', 'id'),
+        # поиск по содержимому: elements @> '[{"type": "image"}]'
+        Index('ix_pages_elements', 'elements', postgresql_using='gin', postgresql_ops={'elements': 'jsonb_path_ops'}),
+    )
+
+
+class PageFile(Base):
+    # файл страницы: строка на вложение, добавление и удаление — один INSERT/DELETE
+    __tablename__ = 'page_files'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    page_id: Mapped[int] = mapped_column(ForeignKey('pages.id', ondelete='CASCADE'))
+    # "<sha256>.<ext>" для блобов, "pages/{id}/..." для старых файлов
+    name: Mapped[str]
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    content_type: Mapped[str | None] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        # список файлов страницы по курсору: WHERE page_id = ? AND id > ? ORDER BY id
+        Index('ix_page_files_page_id_id', 'page_id', 'id'),
+        # страницы, использующие блоб
+        Index('ix_page_files_sha256', 'sha256'),
+    )
+
+
+class PageRevision(Base):
+    # сохранённая версия содержимого: полный снимок или дельта к предыдущей записи
+    __tablename__ = 'page_revisions'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    page_id: Mapped[int] = mapped_column(ForeignKey('pages.id', ondelete='CASCADE'))
+    revision: Mapped[int]
+    # 0 — снимок (data — документ), n — n-я дельта после снимка (data — операции JSON Patch)
+    depth: Mapped[int] = mapped_column(default=0)
+    data: Mapped[dict | list] = mapped_column(JSONB)
+    size: Mapped[int] = mapped_column(default=0)
+
+    __table_args__ = (
+        Index('ix_page_revisions_page_id_revision', 'page_id', 'revision', unique=True),
+        # очистка по сроку хранения
+        Index('ix_page_revisions_created_at', 'created_at'),
+    )
@@ -0,0 +1,180 @@
+"""
+Дельта-изменения списка элементов страницы.
+
+Два вида: операции JSON Patch (RFC 6902) относительно самого списка
+(путь "/3/style/color") и поэлементные upsert/delete по id элемента.
+Функции меняют переданный список на месте и бросают PatchError на первой
+неудачной операции — вызывающий код тогда ничего не сохраняет.
+"""
+from typing import Any
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _parse_pointer(pointer: str) -> list[str]:
+    """JSON Pointer (RFC 6901) -> список токенов."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, for_add: bool = False) -> int:
+    if for_add and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not for_add):
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(document: Any, tokens: list[str]) -> Any:
+    for token in tokens:
+        if isinstance(document, list):
+            document = document[_index(document, token)]
+        elif isinstance(document, dict):
+            if token not in document:
+                raise PatchError(f"Path not found: {token!r}")
+            document = document[token]
+        else:
+            raise PatchError(f"Cannot traverse into {type(document).__name__}")
+    return document
+
+
+def _add(document: Any, tokens: list[str], value: Any) -> None:
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(_index(parent, tokens[-1], for_add=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise PatchError(f"Cannot add into {type(parent).__name__}")
+
+
+def _remove(document: Any, tokens: list[str]) -> Any:
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, tokens[-1]))
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise PatchError(f"Path not found: {tokens[-1]!r}")
+        return parent.pop(tokens[-1])
+    raise PatchError(f"Cannot remove from {type(parent).__name__}")
+
+
+def apply_json_patch(elements: list, operations: list[dict]) -> list:
+    """
+    Применяет операции к списку элементов. Корень документа — сам список,
+    его нельзя заменить или удалить целиком.
+    """
+    for number, operation in enumerate(operations):
+        op = operation.get("op")
+        try:
+            tokens = _parse_pointer(operation.get("path", ""))
+            if not tokens:
+                raise PatchError("Operations on the document root are not allowed")
+            if op in ("add", "replace", "test") and "value" not in operation:
+                raise PatchError("Missing 'value'")
+            if op == "add":
+                _add(elements, tokens, operation["value"])
+            elif op == "remove":
+                _remove(elements, tokens)
+            elif op == "replace":
+                _remove(elements, tokens)
+                _add(elements, tokens, operation["value"])
+            elif op in ("move", "copy"):
+                source = _parse_pointer(operation.get("from", ""))
+                if op == "move" and tokens[:len(source)] == source and len(tokens) > len(source):
+                    raise PatchError("Cannot move a value into its own child")
+                value = _remove(elements, source) if op == "move" else _resolve(elements, source)
+                _add(elements, tokens, value if op == "move" else _copy(value))
+            elif op == "test":
+                if _resolve(elements, tokens) != operation["value"]:
+                    raise PatchError("Test failed")
+            else:
+                raise PatchError(f"Unknown op: {op!r}")
+        except PatchError as e:
+            raise PatchError(f"Operation {number} ({op}): {e}") from None
+    return elements
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def apply_element_changes(elements: list, upsert: list[dict], delete: list[str]) -> list:
+    """
+    Поэлементные изменения по id: upsert заменяет элемент на его месте или
+    добавляет в конец, delete удаляет. Id сравниваются как строки.
+    """
+    positions = {str(el.get("id")): i for i, el in enumerate(elements) if isinstance(el, dict)}
+    for element in upsert:
+        if "id" not in element:
+            raise PatchError("Upserted element has no 'id'")
+        key = str(element["id"])
+        if key in positions:
+            elements[positions[key]] = element
+        else:
+            positions[key] = len(elements)
+            elements.append(element)
+    removed = {str(key) for key in delete}
+    if removed:
+        elements[:] = [el for el in elements if not (isinstance(el, dict) and str(el.get("id")) in removed)]
+    return elements
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def diff_json(old: Any, new: Any) -> list[dict]:
+    """
+    Операции JSON Patch, переводящие old в new. Словари сравниваются по
+    ключам, у списков пропускаются общие начало и конец; словари с разными
+    id (другой элемент) заменяются целиком. Результат применяется
+    apply_json_patch, поэтому корни old и new — контейнеры одного типа.
+    """
+    operations: list[dict] = []
+    _diff(old, new, "", operations)
+    return operations
+
+
+def _diff(old: Any, new: Any, path: str, operations: list[dict]) -> None:
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict) and old.get("id") == new.get("id"):
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+            else:
+                _diff(old[key], value, f"{path}/{_escape(key)}", operations)
+    elif isinstance(old, list) and isinstance(new, list):
+        shortest = min(len(old), len(new))
+        start = 0
+        while start < shortest and old[start] == new[start]:
+            start += 1
+        end = 0
+        while end < shortest - start and old[-1 - end] == new[-1 - end]:
+            end += 1
+        old_middle, new_middle = len(old) - start - end, len(new) - start - end
+        common = min(old_middle, new_middle)
+        for i in range(start, start + common):
+            _diff(old[i], new[i], f"{path}/{i}", operations)
+        for _ in range(old_middle - common):
+            operations.append({"op": "remove", "path": f"{path}/{start + common}"})
+        for i in range(start + common, start + new_middle):
+            operations.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+    else:
+        operations.append({"op": "replace", "path": path, "value": new})
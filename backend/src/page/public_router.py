@@ -1,18 +1,27 @@
 # src/page/public_router.py
-from fastapi import APIRouter, HTTPException, status
+import hashlib
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import Response
+
+from src.blob.dao import BlobDAO
+from src.http_cache import etag_matches
+from src.page.cache import public_page_cache
 from src.page.dao import PageDAO
+from src.page.models import Page
+from src.page.snapshot import snapshot_response
 
 public_router = APIRouter(prefix='/public', tags=['Public Pages'])
 
-@public_router.get("/{page_name}/")
-async def get_public_page(page_name: str):
-    page = await PageDAO.get_one_or_none(name=page_name)
-    if not page:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Page not found"
-        )
-    
+# меняется при изменении формата ответа, чтобы старые ETag не совпали
+PUBLIC_PAYLOAD_VERSION = 3
+# браузер всегда перепроверяет (дёшево, 304), CDN держит минуту и
+# пока обновляет в фоне, отдаёт устаревшую копию
+PUBLIC_PAGE_CACHE_CONTROL = "public, max-age=0, s-maxage=60, stale-while-revalidate=86400"
+
+
+def public_payload(page: Page, images: dict[str, dict] | None = None) -> dict:
     # Возвращаем данные для фронтенда в формате PublicPage.tsx
     return {
         "id": page.id,
@@ -30,6 +39,52 @@ async def get_public_page(page_name: str):
                 "animations": {
                     "enabled": False
                 }
-            }
+            },
+            # картинки-блобы из элементов image по хешу: оригинал и копии по ширине
+            "images": images or {}
         }
-    }
\ No newline at end of file
+    }
+
+
+def public_etag(page_id: int, revision: int, images: dict[str, dict] | None = None) -> str:
+    # копии картинок появляются без новой ревизии страницы — их отпечаток тоже в ETag
+    digest = hashlib.blake2b(json.dumps(images or {}, sort_keys=True).encode(), digest_size=6).hexdigest()
+    return f'"{page_id}-{revision}-{PUBLIC_PAYLOAD_VERSION}-{digest}"'
+
+
+async def _load_public_page(page_name: str) -> tuple[int, str, bytes] | None:
+    page = await PageDAO.get_one_or_none(name=page_name)
+    if not page:
+        return None
+    # вложения не перечисляются: только картинки, показанные на опубликованной странице
+    images = await BlobDAO.image_media(page.id, page.elements) if page.published else {}
+    body = json.dumps(public_payload(page, images), ensure_ascii=False, separators=(",", ":"))
+    return page.id, public_etag(page.id, page.revision, images), body.encode("utf-8")
+
+
+@public_router.get("/{page_name}/")
+async def get_public_page(page_name: str, request: Request):
+    # готовый JSON из кеша: на попадании ни запроса в БД, ни сериализации
+    cached = await public_page_cache.get_or_load(page_name, _load_public_page)
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page not found"
+        )
+    headers = {"ETag": cached.etag, "Cache-Control": PUBLIC_PAGE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+@public_router.get("/{page_name}/html/")
+async def get_public_page_html(page_name: str):
+    # id страницы берём из кеша ответа: на попадании в БД не ходим
+    cached = await public_page_cache.get_or_load(page_name, _load_public_page)
+    snapshot = snapshot_response(cached.page_id) if cached is not None else None
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page snapshot not found"
+        )
+    return snapshot
@@ -1,36 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from typing import List
-import os
-import shutil
-import uuid
 from pathlib import Path
 
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from pydantic import ValidationError
 
-from src.page.schemas import PageCreate, PageUpdate, PageOut
-from src.page.dao import PageDAO
+from src.blob.dao import BlobDAO
+from src.blob.media import DEFAULT_CONTENT_TYPE, file_response
+from src.blob.store import BLOB_TMP_DIR, blob_path, entry_sha256
+from src.page.models import Page, PageFile
+from src.page.schemas import ElementMerge, ElementsPatch, ElementsPatchOut, FileByHash, PageCreate, PageFileListOut, PageListOut, PageUpdate, PageOut, check_changed_elements, dump_elements, element_key
+from src.page.dao import PageDAO, PageFileDAO
+from src.page.logic import PageLogic
+from src.page.patch import PatchError, apply_element_changes, apply_json_patch
+from src.page.upload import UPLOAD_OPENAPI, receive_files
 from src.user.dependencies import get_current_user
 
 router = APIRouter(prefix='/page', tags=['Page'])
 
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+# elements и background в список не попадают: они самые тяжёлые
+SUMMARY_COLUMNS = [Page.id, Page.name, Page.title, Page.description, Page.qr_id, Page.published, Page.created_at]
+FILE_COLUMNS = [PageFile.id, PageFile.name, PageFile.size, PageFile.content_type]
+
+
+def _page_response(page: Page) -> Response:
+    # сразу в JSON-байты pydantic-core, без jsonable_encoder по каждому элементу
+    return Response(PageOut.model_validate(page).model_dump_json(), media_type="application/json")
+
+
 @router.post("/", response_model=PageOut)
 async def create_page(page_data: PageCreate, user: str = Depends(get_current_user)):
-    page = await PageDAO.add(**page_data.model_dump(), user_id=user.id)
-    return page
+    page = await PageDAO.add(
+        **page_data.model_dump(exclude={"elements"}), elements=dump_elements(page_data.elements or []), user_id=user.id
+    )
+    return _page_response(page)
 
 @router.get("/{page_id}/", response_model=PageOut)
 async def get_page(page_id: int):
     page = await PageDAO.get_one_or_none(id=page_id)
     if not page:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
-    return page
+    return _page_response(page)
 
-@router.get("/", response_model=List[PageOut])
-async def get_all_pages(user: str = Depends(get_current_user)):
-    pages = await PageDAO.get(user_id=user.id)
-    return pages
+@router.get("/", response_model=PageListOut)
+async def get_all_pages(
+    after: int | None = Query(None, ge=0),
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    user: str = Depends(get_current_user),
+):
+    pages, next_cursor = await PageDAO.get_keyset(SUMMARY_COLUMNS, after=after, limit=limit, user_id=user.id)
+    return PageListOut(items=pages, next_cursor=next_cursor)
 
 @router.put("/{page_id}/", response_model=PageOut)
 async def update_page(
@@ -40,68 +60,121 @@ async def update_page(
 ):
     update_data = page_data.model_dump(exclude_unset=True)
 
-    updated_count = await PageDAO.update(id=page_id, **update_data)
-    if not updated_count:
+    page = await PageDAO.update_returning(id=page_id, values=update_data, user_id=user.id)
+    if not page:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Page not found or no changes"
+            detail="Page not found"
         )
+    return _page_response(page)
+
+
+@router.patch("/{page_id}/elements/", response_model=ElementsPatchOut)
+async def patch_page_elements(
+    page_id: int,
+    patch: ElementsPatch,
+    user: str = Depends(get_current_user),
+):
+    if not patch.ops:
+        # только upsert/delete — собирается в одном UPDATE на стороне БД
+        revision = await PageDAO.change_elements(
+            id=page_id, user_id=user.id, revision=patch.revision, upsert=dump_elements(patch.upsert), delete=patch.delete
+        )
+        return ElementsPatchOut(id=page_id, revision=revision)
+
+    # сначала операции JSON Patch, затем upsert и delete по id элемента
+    operations = [op.as_dict() for op in patch.ops]
+    upsert = dump_elements(patch.upsert)
+
+    def apply(elements: list) -> list:
+        unchanged = {element_key(element) for element in elements}
+        apply_json_patch(elements, operations)
+        apply_element_changes(elements, upsert, patch.delete)
+        # операции могли собрать что угодно: проверяются затронутые элементы
+        try:
+            return check_changed_elements(elements, unchanged)
+        except ValidationError as e:
+            raise PatchError(f"Invalid elements: {e.errors(include_url=False, include_input=False)}") from None
+
+    revision = await PageDAO.patch_elements(
+        id=page_id, user_id=user.id, revision=patch.revision, apply=apply
+    )
+    return ElementsPatchOut(id=page_id, revision=revision)
 
-    page = await PageDAO.get_one_or_none(id=page_id)
-    return page
+
+@router.patch("/{page_id}/elements/{element_id}/", response_model=ElementsPatchOut)
+async def merge_page_element(
+    page_id: int,
+    element_id: str,
+    merge: ElementMerge,
+    user: str = Depends(get_current_user),
+):
+    # перетаскивание и ресайз: меняются несколько полей одного элемента
+    revision = await PageDAO.merge_element(
+        id=page_id, user_id=user.id, revision=merge.revision, element_id=element_id, fields=merge.fields.model_dump(exclude_unset=True)
+    )
+    return ElementsPatchOut(id=page_id, revision=revision)
 
 
 @router.delete("/{page_id}/")
 async def delete_page(page_id: int, user: str = Depends(get_current_user)):
-    deleted_count = await PageDAO.delete(id=page_id)
+    deleted_count = await PageDAO.delete(id=page_id, user_id=user.id)
     if not deleted_count:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
     return {"ok": True, "message": "Page successfully deleted"}
 
-@router.post("/{page_id}/files/", response_model=dict)
+@router.post("/{page_id}/files/", response_model=dict, openapi_extra=UPLOAD_OPENAPI)
 async def upload_files(
     page_id: int,
-    files: List[UploadFile] = File(...),
+    request: Request,
     user: str = Depends(get_current_user)
 ):
+    # владение проверяем до приёма тела: чужой запрос не пишет на диск
     page = await PageDAO.get_one_or_none(id=page_id, user_id=user.id)
     if not page:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
     
-    upload_dir = Path("uploads/pages") / str(page_id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    stored = await receive_files(request, BLOB_TMP_DIR)
+    # уже хранимые байты не пишутся второй раз: только refcount + 1
+    new_files = await BlobDAO.acquire(stored)
     
-    new_files = []
-    for file in files:
-        if file.size > 10 * 1024 * 1024:  
-            raise HTTPException(400, f"File {file.filename} too large")
-        
-        ext = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{ext}"
-        file_path = upload_dir / unique_filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        new_files.append(str(file_path.relative_to("uploads")))
-    
-    current_files = page.files or []
-    page.files = current_files + new_files
-    
-    await PageDAO.update(id=page_id, files=page.files)
+    total_files = await PageLogic.attach_files(page_id, new_files)
     
     return {
         "files_added": len(new_files),
-        "total_files": len(page.files),
-        "new_files": new_files
+        "total_files": total_files,
+        "new_files": [file["name"] for file in new_files],
+        "sha256": [item.sha256 for item in stored],
     }
 
-@router.get("/{page_id}/files/", response_model=List[str])
-async def list_page_files(page_id: int, user: str = Depends(get_current_user)):
+@router.post("/{page_id}/files/by-hash/", response_model=dict)
+async def attach_file_by_hash(
+    page_id: int,
+    file: FileByHash,
+    user: str = Depends(get_current_user)
+):
+    # клиент сначала предлагает хеш: если эти байты уже есть в его файлах, загрузка не нужна
     page = await PageDAO.get_one_or_none(id=page_id, user_id=user.id)
     if not page:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
-    return page.files or []
+    new_file = await BlobDAO.acquire_existing(file.sha256, file.filename, user.id)
+    if new_file is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blob not found, upload the file")
+    total_files = await PageLogic.attach_files(page_id, [new_file])
+    return {"new_file": new_file["name"], "total_files": total_files}
+
+@router.get("/{page_id}/files/", response_model=PageFileListOut)
+async def list_page_files(
+    page_id: int,
+    after: int | None = Query(None, ge=0),
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    user: str = Depends(get_current_user),
+):
+    page = await PageDAO.get_one_or_none(id=page_id, user_id=user.id)
+    if not page:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
+    files, next_cursor = await PageFileDAO.get_keyset(FILE_COLUMNS, after=after, limit=limit, page_id=page_id)
+    return PageFileListOut(items=files, next_cursor=next_cursor)
 
 @router.delete("/{page_id}/files/{filename}/")
 async def delete_file(
@@ -113,15 +186,19 @@ async def delete_file(
     if not page:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
     
-    file_path = Path("uploads/pages") / str(page_id) / filename
-    if file_path.exists():
-        file_path.unlink()
+    remaining_files = await PageFileDAO.remove(page_id=page_id, name=filename)
+    if remaining_files is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     
-    if filename in page.files:
-        page.files.remove(filename)
-        await PageDAO.update(id=page_id, files=page.files)
+    if entry_sha256(filename) is None:
+        # старые файлы лежат в каталоге страницы
+        file_path = Path("uploads/pages") / str(page_id) / filename
+        if file_path.exists():
+            file_path.unlink()
+    else:
+        await BlobDAO.release([filename])
     
-    return {"message": "File deleted", "remaining_files": len(page.files or [])}
+    return {"message": "File deleted", "remaining_files": remaining_files}
 
 @router.get("/{page_id}/files/{filename}/")
 async def download_file(page_id: int, filename: str, user: str = Depends(get_current_user)):
@@ -129,15 +206,21 @@ async def download_file(page_id: int, filename: str, user: str = Depends(get_cur
     if not page:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
     
-    if filename not in (page.files or []):
+    file = await PageFileDAO.find(page_id=page_id, name=filename)
+    if file is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     
-    file_path = Path("uploads/pages") / str(page_id) / filename
+    if file.sha256 is not None:
+        file_path = blob_path(file.sha256)
+        # тип определён при загрузке; блоб неизменен — браузер может не перепроверять
+        media_type = file.content_type or DEFAULT_CONTENT_TYPE
+        headers = {"ETag": f'"{file.sha256}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    else:
+        file_path = Path("uploads/pages") / str(page_id) / filename
+        media_type = DEFAULT_CONTENT_TYPE
+        headers = None
     if not file_path.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on disk")
     
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/octet-stream"
-    )
+    # Range/If-Range, sendfile или X-Accel-Redirect — в file_response
+    return file_response(file_path, media_type, headers, filename=filename)
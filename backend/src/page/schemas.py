@@ -1,69 +1,105 @@
-from pydantic import BaseModel, HttpUrl, Field
-from typing import Literal, Union, Optional, List
-
-# class BaseElement(BaseModel):
-#     id: int
-#     x: float
-#     y: float
-#     z_index: int = 0
-#     type: str
-
-# # --- Типы элементов ---
-# class RectangleElement(BaseElement):
-#     type: Literal["rectangle"]
-#     width: float
-#     height: float
-#     fill_color: Optional[str] = None
-#     stroke_color: Optional[str] = None
-#     stroke_width: Optional[float] = 0
-    
-# class EllipseElement(BaseElement):
-#     type: Literal["ellipse"]
-#     width: float
-#     height: float
-#     fill_color: Optional[str] = "#ffffff"
-#     stroke_color: Optional[str] = None
-#     stroke_width: Optional[float] = 0
-    
-# class LineElement(BaseElement):
-#     type: Literal["line"]
-#     x2: float
-#     y2: float
-#     stroke_color: Optional[str] = "#000000"
-#     stroke_width: Optional[float] = 1
-
-# class TextElement(BaseElement):
-#     type: Literal["text"]
-#     text: str
-#     font_family: Optional[str] = "Arial"
-#     font_size: Optional[int] = 16
-#     font_weight: Optional[str] = "normal"  
-#     text_align: Optional[Literal["left", "center", "right"]] = "left"
-#     color: Optional[str] = "#000000"
-
-# class ImageElement(BaseElement):
-#     type: Literal["image"]
-#     src: HttpUrl | str 
-#     width: float
-#     height: float
-#     border_radius: Optional[float] = 0
-#     fit: Optional[Literal["contain", "cover", "fill"]] = "contain"
-
-# class FrameElement(BaseElement):
-#     type: Literal["frame"]
-#     width: float
-#     height: float
-#     background_color: Optional[str] = None
-#     children: Optional[List[int]] = Field(default_factory=list, description="ID дочерних элементов")
-
-# PageElement = Union[
-#     RectangleElement,
-#     EllipseElement,
-#     LineElement,
-#     TextElement,
-#     ImageElement,
-#     FrameElement
-# ]
+import pydantic_core
+from pydantic import BaseModel, Field, TypeAdapter
+from datetime import datetime
+from typing import Annotated, Literal, Union
+
+# --- Элементы страницы (формат редактора PageEditor.tsx) ---
+class ElementStyle(BaseModel):
+    fontSize: float | None = None
+    fontFamily: str | None = None
+    color: str | None = None
+    bold: bool | None = None
+    italic: bool | None = None
+    underline: bool | None = None
+
+    class Config:
+        extra = "forbid"
+
+class DrawingStyle(BaseModel):
+    color: str | None = None
+    lineWidth: float | None = None
+
+    class Config:
+        extra = "forbid"
+
+class BaseElement(BaseModel):
+    id: str | int
+    content: str = ""
+    x: float
+    y: float
+    width: float
+    height: float
+    rotation: float = 0
+    style: ElementStyle = Field(default_factory=ElementStyle)
+
+    class Config:
+        extra = "forbid"
+
+class TextElement(BaseElement):
+    type: Literal["text"]
+
+class ImageElement(BaseElement):
+    # content — URL, /blob/<sha256> или data URL
+    type: Literal["image"]
+
+class VideoElement(BaseElement):
+    type: Literal["video"]
+
+class LinkElement(BaseElement):
+    type: Literal["link"]
+
+class YoutubeElement(BaseElement):
+    type: Literal["youtube"]
+
+class DrawingElement(BaseElement):
+    # content — JSON-массив точек [{"x": .., "y": ..}], рисуется поверх холста
+    type: Literal["drawing"]
+    style: DrawingStyle = Field(default_factory=DrawingStyle)
+
+# выбор модели по полю type — одна проверка тега, без перебора вариантов
+PageElement = Annotated[
+    Union[TextElement, ImageElement, VideoElement, LinkElement, YoutubeElement, DrawingElement],
+    Field(discriminator="type"),
+]
+page_elements = TypeAdapter(list[PageElement])
+page_element = TypeAdapter(PageElement)
+
+
+def dump_elements(elements: list[BaseElement]) -> list[dict]:
+    """Элементы для JSONB: только присланные клиентом поля, без значений по умолчанию."""
+    return page_elements.dump_python(elements, mode="json", exclude_unset=True)
+
+
+def element_key(element) -> bytes:
+    return pydantic_core.to_json(element)
+
+
+def check_changed_elements(elements: list, unchanged: set[bytes]) -> list:
+    """
+    Проверка списка после JSON Patch: только новые и изменённые элементы.
+    Строки, сохранённые до типизации, остаются как есть, пока их не трогают.
+    """
+    return [element if element_key(element) in unchanged else check_element(element) for element in elements]
+
+
+def check_element(element: dict) -> dict:
+    """Один элемент после слияния полей: модель выбирается по его type."""
+    return page_element.dump_python(page_element.validate_python(element), mode="json", exclude_unset=True)
+
+
+class ElementFields(BaseModel):
+    # частичное обновление элемента: id и type не меняются, null не допускается;
+    # style проверяется вместе с элементом — его модель зависит от type
+    content: str = ""
+    x: float = 0
+    y: float = 0
+    width: float = 0
+    height: float = 0
+    rotation: float = 0
+    style: dict = Field(default_factory=dict)
+
+    class Config:
+        extra = "forbid"
 
 class PageCreate(BaseModel):
     qr_id: int | None = None
@@ -71,8 +107,7 @@ class PageCreate(BaseModel):
     title: str = ""
     description: str | None = None
     background: dict = Field(default_factory=lambda: {"type": "color", "value": "#040404"})
-    elements: list[dict] | None = None
-    files: List[str] = []
+    elements: list[PageElement] | None = None
     theme_settings: dict = Field(default_factory=lambda: {
         "textColor": "#ffffff",
         "accentColor": "#7c6afa"
@@ -82,7 +117,7 @@ class PageUpdate(BaseModel):
     qr_id: int | None = None
     name: str | None = None
     background: dict | None = None
-    elements: list[dict] | None = None
+    elements: list[PageElement] | None = None
 
 class PageOut(BaseModel):
     id: int
@@ -91,6 +126,109 @@ class PageOut(BaseModel):
     qr_id: int | None = None
     background: dict
     elements: list[dict] | None = None
+    revision: int = 1
+
+    class Config:
+        from_attributes = True
+
+class JsonPatchOp(BaseModel):
+    # операция RFC 6902, путь относительно списка элементов: "/3/style/color"
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: object = None
+    from_: str | None = Field(None, alias="from")
+
+    def as_dict(self) -> dict:
+        # value: null и отсутствующий value для add/replace/test — разные вещи
+        operation = {"op": self.op, "path": self.path}
+        if "value" in self.model_fields_set:
+            operation["value"] = self.value
+        if self.from_ is not None:
+            operation["from"] = self.from_
+        return operation
+
+class ElementsPatch(BaseModel):
+    # ревизия, на которой основана правка; не совпала — 409
+    revision: int
+    ops: list[JsonPatchOp] = []
+    upsert: list[PageElement] = []
+    delete: list[str | int] = []
+
+class ElementMerge(BaseModel):
+    # поля, которые сливаются с элементом: {"x": 10, "y": 20}
+    revision: int
+    fields: ElementFields
+
+class ElementsPatchOut(BaseModel):
+    id: int
+    revision: int
+
+class FileByHash(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-f]{64}$")
+    filename: str = ""
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    # если такой блоб уже есть, файл прикрепляется сразу, без загрузки
+    sha256: str | None = Field(None, pattern=r"^[0-9a-f]{64}$")
+
+class UploadOut(BaseModel):
+    upload_id: str | None = None
+    offset: int
+    size: int
+    complete: bool = False
+    file: str | None = None
+
+class PageSummary(BaseModel):
+    # для списков: без elements и background
+    id: int
+    name: str
+    title: str = ""
+    description: str | None = None
+    qr_id: int | None = None
+    published: bool = True
+    created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class PageListOut(BaseModel):
+    items: list[PageSummary]
+    next_cursor: int | None = None
+
+class PageFileOut(BaseModel):
+    id: int
+    name: str
+    size: int | None = None
+    content_type: str | None = None
+
+    class Config:
+        from_attributes = True
+
+class PageFileListOut(BaseModel):
+    items: list[PageFileOut]
+    next_cursor: int | None = None
+
+class PageRevisionOut(BaseModel):
+    revision: int
+    # полный снимок или дельта к предыдущей версии
+    snapshot: bool
+    size: int
+    created_at: datetime
+
+class PageRevisionListOut(BaseModel):
+    items: list[PageRevisionOut]
+    next_cursor: int | None = None
+
+class PageRevisionContent(BaseModel):
+    revision: int
+    title: str = ""
+    description: str | None = None
+    background: dict
+    elements: list[dict] | None = None
+    theme_settings: dict
+
+class RevisionRestore(BaseModel):
+    # текущая ревизия страницы: восстановление поверх чужой правки — 409
+    revision: int
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Статические HTML-снимки опубликованных страниц.
+
+Публичная страница рисуется на клиенте из JSON: после скана это загрузка
+бандла и ещё один запрос к API до первой отрисовки. Снимок — один
+самодостаточный HTML-файл с теми же элементами, его отдают прямо по
+короткой ссылке. Пересборка после сохранения откладывается на
+PAGE_SNAPSHOT_DEBOUNCE секунд (серия автосохранений — одна сборка) и
+идёт в фоне; файл заменяется атомарно.
+"""
+import asyncio
+import html
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+
+from src.blob.media import BLOB_URL, load_image_media
+from src.config import settings
+from src.database import async_session_maker
+from src.page.models import Page
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path("uploads/snapshots")
+SNAPSHOT_CACHE_CONTROL = "public, max-age=0, s-maxage=60, stale-while-revalidate=86400"
+# размеры холста редактора (телефонный фрейм без рамки)
+STAGE_WIDTH, STAGE_HEIGHT = 327, 619
+DRAWING_WIDTH, DRAWING_HEIGHT = 351, 643
+
+# в CSS попадают только «безобидные» значения: цвета, шрифты, градиенты
+_SAFE_CSS = re.compile(r"^[#\w\s.,%()'-]+$")
+_YOUTUBE_ID = re.compile(r"(?:youtube\.com/.*v=|youtu\.be/)([\w-]{6,20})")
+_LINK_SCHEMES = ("http://", "https://", "mailto:", "tel:")
+
+_STYLE = (
+    "html,body{margin:0;min-height:100%}"
+    "body{display:flex;justify-content:center;background:#000;font-family:Roboto,Arial,sans-serif}"
+    f".stage{{position:relative;width:{STAGE_WIDTH}px;height:{STAGE_HEIGHT}px;overflow:hidden}}"
+    ".el{position:absolute;transform-origin:center center}"
+    ".text{width:100%;height:100%;box-sizing:border-box;padding:8px;overflow:hidden;"
+    "display:flex;align-items:center;justify-content:center;white-space:pre-wrap}"
+    ".el img,.el video,.el iframe{width:100%;height:100%;border:0;border-radius:4px}"
+    ".el img{object-fit:contain}.el video{object-fit:cover;background:#000}"
+    ".el picture{display:block;width:100%;height:100%}"
+    ".link{display:flex;width:100%;height:100%;align-items:center;justify-content:center;"
+    "border:2px solid rgba(96,165,250,.5);background:rgba(96,165,250,.1);border-radius:4px;"
+    "color:#60a5fa;font-size:12px;text-decoration:none;overflow:hidden}"
+    ".drawings{position:absolute;left:0;top:0;pointer-events:none}"
+)
+
+
+def snapshot_path(page_id: int) -> Path:
+    return SNAPSHOT_DIR / f"{page_id}.html"
+
+
+def _css(value, default: str) -> str:
+    value = str(value) if value not in (None, "") else default
+    return value if _SAFE_CSS.match(value) and "url(" not in value.lower() else default
+
+
+def _number(value, default: float) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if number == number and abs(number) < 100_000 else default
+
+
+def _url(value, schemes: tuple[str, ...]) -> str | None:
+    if isinstance(value, str) and value.strip().lower().startswith(schemes):
+        return value.strip()
+    return None
+
+
+def _background(background: dict | None) -> str:
+    if not background:
+        return "background:linear-gradient(135deg,#7c6afa 0%,#c89afc 100%)"
+    kind, value = background.get("type"), background.get("value")
+    if kind == "color":
+        return f"background-color:{_css(value, '#040404')}"
+    if kind == "gradient":
+        return f"background:{_css(value, '#040404')}"
+    if kind == "image":
+        url = _url(value, ("http://", "https://", "data:image/", "/"))
+        if url:
+            url = url.replace("\\", "%5C").replace('"', "%22").replace("\n", "")
+            return f'background-image:url("{url}");background-size:cover;background-position:center'
+    return ""
+
+
+def _srcset(variants: list[dict], media_type: str) -> str:
+    return ", ".join(f'{v["src"]} {v["width"]}w' for v in variants if v["type"] == media_type)
+
+
+def _image(content: str, width: float, images: dict[str, dict]) -> str:
+    """Картинка из блоба с копиями — <picture> с srcset, браузер берёт нужную ширину."""
+    src = html.escape(content, quote=True)
+    match = BLOB_URL.search(content)
+    media = images.get(match.group(1)) if match else None
+    if not media or not media["variants"]:
+        return f'<img src="{src}" alt="" loading="lazy">'
+    sources = "".join(
+        f'<source type="{media_type}" srcset="{srcset}" sizes="{width:g}px">'
+        for media_type in ("image/avif", "image/webp")
+        if (srcset := _srcset(media["variants"], media_type))
+    )
+    return f'<picture>{sources}<img src="{src}" alt="" loading="lazy"></picture>'
+
+
+def _element(el: dict, images: dict[str, dict]) -> str:
+    kind, content = el.get("type"), el.get("content")
+    style = el.get("style") or {}
+    if kind == "text" and content:
+        inner = (
+            f'<div class="text" style="color:{_css(style.get("color"), "#000000")};'
+            f'font-size:{_number(style.get("fontSize"), 24):g}px;'
+            f"font-family:{_css(style.get('fontFamily'), 'Roboto')},Roboto,Arial,sans-serif;"
+            f'font-weight:{"bold" if style.get("bold") else "normal"};'
+            f'font-style:{"italic" if style.get("italic") else "normal"};'
+            f'text-decoration:{"underline" if style.get("underline") else "none"}">'
+            f"{html.escape(str(content))}</div>"
+        )
+    elif kind == "image" and _url(content, ("data:image/", "http://", "https://", "/blob/")):
+        inner = _image(content.strip(), _number(el.get("width"), 150), images)
+    elif kind == "video" and _url(content, ("data:video/", "http://", "https://")):
+        inner = f'<video src="{html.escape(content, quote=True)}" controls autoplay muted playsinline></video>'
+    elif kind == "link" and (url := _url(content, _LINK_SCHEMES)):
+        label = html.escape(url[:20])
+        inner = f'<a class="link" href="{html.escape(url, quote=True)}" rel="noopener">🔗 {label}...</a>'
+    elif kind == "youtube" and isinstance(content, str) and (match := _YOUTUBE_ID.search(content)):
+        inner = (
+            f'<iframe src="https://www.youtube.com/embed/{match.group(1)}" loading="lazy" allowfullscreen '
+            'allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share">'
+            "</iframe>"
+        )
+    else:
+        return ""
+    return (
+        f'<div class="el" style="left:{_number(el.get("x"), 0):g}px;top:{_number(el.get("y"), 0):g}px;'
+        f'width:{_number(el.get("width"), 150):g}px;height:{_number(el.get("height"), 50):g}px;'
+        f'transform:rotate({_number(el.get("rotation"), 0):g}deg)">{inner}</div>'
+    )
+
+
+def _drawings(elements: list[dict]) -> str:
+    lines = []
+    for el in elements:
+        if el.get("type") != "drawing":
+            continue
+        try:
+            points = json.loads(el.get("content") or "[]")
+            coords = " ".join(f"{_number(p['x'], 0):g},{_number(p['y'], 0):g}" for p in points)
+        except (TypeError, ValueError, KeyError):
+            continue
+        if len(points) < 2:
+            continue
+        style = el.get("style") or {}
+        lines.append(
+            f'<polyline points="{coords}" fill="none" stroke="{_css(style.get("color"), "#ffffff")}" '
+            f'stroke-width="{_number(style.get("lineWidth"), 3):g}" stroke-linecap="round" stroke-linejoin="round"/>'
+        )
+    if not lines:
+        return ""
+    return (
+        f'<svg class="drawings" width="{DRAWING_WIDTH}" height="{DRAWING_HEIGHT}" '
+        f'viewBox="0 0 {DRAWING_WIDTH} {DRAWING_HEIGHT}">{"".join(lines)}</svg>'
+    )
+
+
+def render_snapshot(page: Page, images: dict[str, dict] | None = None) -> str:
+    """images — load_image_media страницы: копии картинок из блобов по хешу."""
+    elements = [el for el in (page.elements or []) if isinstance(el, dict)]
+    images = images or {}
+    theme = page.theme_settings or {}
+    return (
+        '<!doctype html><html lang="ru"><head><meta charset="utf-8">'
+        # фрейм редактора 375px: мобильный браузер масштабирует его под экран
+        '<meta name="viewport" content="width=375">'
+        f"<title>{html.escape(page.title or page.name)}</title>"
+        f"<style>{_STYLE}</style></head>"
+        f'<body style="color:{_css(theme.get("textColor"), "#ffffff")}">'
+        f'<main class="stage" style="{html.escape(_background(page.background), quote=True)}">'
+        f'{"".join(_element(el, images) for el in elements)}{_drawings(elements)}'
+        "</main></body></html>"
+    )
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def snapshot_response(page_id: int) -> FileResponse | None:
+    """Готовый снимок или None, если его ещё нет (страницу рисует фронтенд)."""
+    path = snapshot_path(page_id)
+    if not path.is_file():
+        return None
+    return FileResponse(
+        path,
+        media_type="text/html; charset=utf-8",
+        headers={"Cache-Control": SNAPSHOT_CACHE_CONTROL},
+    )
+
+
+class SnapshotBuilder:
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        # страницы, сохранённые ещё раз во время сборки: пересобрать после неё
+        self._dirty: set[int] = set()
+        self.built = 0
+        self.failures = 0
+
+    def schedule(self, page_id: int) -> None:
+        """Вызывается после коммита; повторный вызов переносит сборку."""
+        timer = self._timers.pop(page_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[page_id] = asyncio.get_running_loop().call_later(self.debounce, self._fire, page_id)
+
+    def _fire(self, page_id: int) -> None:
+        self._timers.pop(page_id, None)
+        if page_id in self._running:
+            self._dirty.add(page_id)
+            return
+        task = asyncio.create_task(self._build(page_id))
+        self._running[page_id] = task
+        task.add_done_callback(lambda _: self._done(page_id))
+
+    def _done(self, page_id: int) -> None:
+        del self._running[page_id]
+        if page_id in self._dirty:
+            self._dirty.discard(page_id)
+            self._fire(page_id)
+
+    async def _build(self, page_id: int) -> None:
+        try:
+            async with async_session_maker() as session:
+                page = await session.scalar(select(Page).where(Page.id == page_id))
+                images = await load_image_media(session, page_id, page.elements) if page is not None and page.published else {}
+            path = snapshot_path(page_id)
+            if page is None or not page.published:
+                await run_in_threadpool(path.unlink, missing_ok=True)
+                return
+            # элементы могут содержать мегабайтные data URL — сборка и запись вне event loop
+            content = await run_in_threadpool(render_snapshot, page, images)
+            await run_in_threadpool(_write_atomic, path, content)
+            self.built += 1
+        except Exception:
+            self.failures += 1
+            logger.exception("Page snapshot build failed for page %d", page_id)
+
+    async def close(self) -> None:
+        """При остановке собирает отложенное сразу, не дожидаясь таймеров."""
+        pending = list(self._timers)
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for page_id in pending:
+            self._fire(page_id)
+        while self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "scheduled": len(self._timers),
+            "running": len(self._running),
+            "built": self.built,
+            "failures": self.failures,
+        }
+
+
+snapshot_builder = SnapshotBuilder(debounce=settings.PAGE_SNAPSHOT_DEBOUNCE)
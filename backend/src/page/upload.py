@@ -0,0 +1,233 @@
+"""
+Потоковый приём файлов страницы.
+
+Тело multipart разбирается по мере поступления, без промежуточного
+SpooledTemporaryFile: данные части копятся до UPLOAD_CHUNK и пишутся в
+.part-файл в пуле потоков, там же считается SHA-256 — один проход по
+байтам. Пока поток пишет одну порцию, event loop принимает следующую.
+Лимит размера проверяется на каждом куске, лишнее не принимается.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from src.blob.media import DEFAULT_CONTENT_TYPE, SNIFF_BYTES, sniff_content_type
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_UPLOAD_FILES = 20
+UPLOAD_CHUNK = 1024 * 1024
+# обычные поля формы не нужны, но и копить их без предела нельзя
+MAX_FIELD_BYTES = 64 * 1024
+
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                }
+            }
+        },
+    }
+}
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    filename: str  # имя от клиента, только для ответа
+    path: Path
+    size: int
+    sha256: str
+    content_type: str = DEFAULT_CONTENT_TYPE
+
+
+class _FileWriter:
+    """Одна файловая часть. write/finish/discard вызываются только в пуле."""
+
+    def __init__(self, filename: str, path: Path):
+        self.filename = filename
+        self.path = path
+        self.tmp = path.with_name(path.name + ".part")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        # начало файла — по нему определяется тип
+        self.head = b""
+        self.pending = bytearray()
+        self._file = None
+
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = open(self.tmp, "wb")
+        self._file.write(data)
+        self.digest.update(data)
+
+    def finish(self) -> None:
+        if self._file is None:
+            self._file = open(self.tmp, "wb")
+        self._file.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self.tmp.unlink(missing_ok=True)
+        self.path.unlink(missing_ok=True)
+
+
+def _write_batch(batch: list[tuple[_FileWriter, bytes, bool]]) -> None:
+    for writer, data, finish in batch:
+        if data:
+            writer.write(data)
+        if finish:
+            writer.finish()
+
+
+class _Receiver:
+    def __init__(self, directory: Path, field: str, limit: int, max_files: int):
+        self.directory = directory
+        self.field = field
+        self.limit = limit
+        self.max_files = max_files
+        self.files: list[_FileWriter] = []
+        self._current: _FileWriter | None = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_bytes = 0
+        self._batch: list[tuple[_FileWriter, bytes, bool]] = []
+        self._io: asyncio.Future | None = None
+
+    # --- колбэки парсера, вызываются синхронно внутри parser.write ---
+
+    def on_part_begin(self) -> None:
+        self._current = None
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if b"filename" not in options or options.get(b"name", b"").decode("latin-1") != self.field:
+            return
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"At most {self.max_files} files per request")
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        suffix = Path(filename).suffix
+        self._current = _FileWriter(filename, self.directory / f"{uuid.uuid4()}{suffix}")
+        self.files.append(self._current)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        writer = self._current
+        if writer is None:
+            self._field_bytes += end - start
+            if self._field_bytes > MAX_FIELD_BYTES:
+                raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Form fields too large")
+            return
+        writer.size += end - start
+        if writer.size > self.limit:
+            raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"File {writer.filename} too large")
+        if len(writer.head) < SNIFF_BYTES:
+            writer.head += data[start:min(end, start + SNIFF_BYTES - len(writer.head))]
+        writer.pending += data[start:end]
+        if len(writer.pending) >= UPLOAD_CHUNK:
+            self._batch.append((writer, bytes(writer.pending), False))
+            writer.pending.clear()
+
+    def on_part_end(self) -> None:
+        writer = self._current
+        if writer is not None:
+            self._batch.append((writer, bytes(writer.pending), True))
+            writer.pending.clear()
+            self._current = None
+
+    # --- запись ---
+
+    async def _flush(self) -> None:
+        """Порция уходит в пул; ждём только предыдущую, чтобы сохранить порядок."""
+        if not self._batch:
+            return
+        if self._io is not None:
+            await self._io
+        batch, self._batch = self._batch, []
+        self._io = asyncio.ensure_future(run_in_threadpool(_write_batch, batch))
+
+    async def receive(self, request: Request) -> list[StoredUpload]:
+        _, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Expected multipart/form-data")
+        parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await self._flush()
+            parser.finalize()
+            await self._flush()
+            if self._io is not None:
+                await self._io
+            if self._current is not None or not self.files:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, "No complete files in request")
+        except BaseException as e:
+            if self._io is not None:
+                await asyncio.gather(self._io, return_exceptions=True)
+            await run_in_threadpool(lambda: [writer.discard() for writer in self.files])
+            if isinstance(e, MultipartParseError):
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, "Malformed multipart body") from e
+            raise
+        return [
+            StoredUpload(
+                writer.filename,
+                writer.path,
+                writer.size,
+                writer.digest.hexdigest(),
+                sniff_content_type(writer.head, writer.filename),
+            )
+            for writer in self.files
+        ]
+
+
+async def receive_files(
+    request: Request,
+    directory: Path,
+    field: str = "files",
+    limit: int = MAX_UPLOAD_BYTES,
+    max_files: int = MAX_UPLOAD_FILES,
+) -> list[StoredUpload]:
+    """
+    Принимает файлы поля field в directory под uuid-именами. Всё или
+    ничего: при ошибке или обрыве записанные файлы удаляются.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_files * limit + MAX_FIELD_BYTES:
+        # честный клиент с заведомо большим телом получает отказ до загрузки
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Request too large")
+    await run_in_threadpool(directory.mkdir, parents=True, exist_ok=True)
+    return await _Receiver(directory, field, limit, max_files).receive(request)
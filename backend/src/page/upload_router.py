@@ -0,0 +1,102 @@
+# src/page/upload_router.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+
+from src.blob.dao import BlobDAO, UploadDAO
+from src.blob.media import sniff_content_type
+from src.blob.resumable import append_chunk, hash_upload, upload_offset, upload_path
+from src.config import settings
+from src.page.logic import PageLogic
+from src.page.schemas import UploadCreate, UploadOut
+from src.page.upload import StoredUpload
+from src.user.dependencies import get_current_user
+
+# докачиваемые загрузки: сессия -> PUT кусков с offset -> complete
+upload_router = APIRouter(prefix='/page', tags=['Page Uploads'])
+
+
+async def _get_upload(page_id: int, upload_id: str, user_id: int):
+    upload = await UploadDAO.get_one_or_none(id=upload_id, page_id=page_id, user_id=user_id)
+    if not upload:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return upload
+
+
+def _offset_headers(offset: int, size: int) -> dict:
+    return {"Upload-Offset": str(offset), "Upload-Length": str(size), "Cache-Control": "no-store"}
+
+
+@upload_router.post("/{page_id}/uploads/", response_model=UploadOut)
+async def create_upload(page_id: int, data: UploadCreate, user: str = Depends(get_current_user)):
+    page = await PageLogic.get_one_or_none(id=page_id, user_id=user.id)
+    if not page:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
+    if data.size > settings.RESUMABLE_UPLOAD_MAX_BYTES:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "File too large")
+
+    existing = await BlobDAO.acquire_existing(data.sha256, data.filename, user.id) if data.sha256 else None
+    if existing is not None:
+        await PageLogic.attach_files(page_id, [existing])
+        return UploadOut(offset=data.size, size=data.size, complete=True, file=existing["name"])
+
+    await UploadDAO.purge_expired()
+    upload = await UploadDAO.add(
+        user_id=user.id, page_id=page_id, filename=data.filename, size=data.size, sha256=data.sha256
+    )
+    return UploadOut(upload_id=upload.id, offset=0, size=upload.size)
+
+
+@upload_router.head("/{page_id}/uploads/{upload_id}/")
+@upload_router.get("/{page_id}/uploads/{upload_id}/", response_model=UploadOut)
+async def get_upload_offset(page_id: int, upload_id: str, response: Response, user: str = Depends(get_current_user)):
+    # с какого места продолжать после обрыва
+    upload = await _get_upload(page_id, upload_id, user.id)
+    offset = upload_offset(upload_id) or 0
+    response.headers.update(_offset_headers(offset, upload.size))
+    return UploadOut(upload_id=upload_id, offset=offset, size=upload.size)
+
+
+@upload_router.put("/{page_id}/uploads/{upload_id}/", response_model=UploadOut)
+async def put_upload_chunk(
+    page_id: int,
+    upload_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0),
+    user: str = Depends(get_current_user),
+):
+    # тело — сырые байты куска; offset не совпал — 409 с текущим
+    upload = await _get_upload(page_id, upload_id, user.id)
+    new_offset = await append_chunk(request, upload_id, offset, upload.size)
+    response.headers.update(_offset_headers(new_offset, upload.size))
+    return UploadOut(upload_id=upload_id, offset=new_offset, size=upload.size)
+
+
+@upload_router.post("/{page_id}/uploads/{upload_id}/complete/", response_model=UploadOut)
+async def complete_upload(page_id: int, upload_id: str, user: str = Depends(get_current_user)):
+    upload = await _get_upload(page_id, upload_id, user.id)
+    page = await PageLogic.get_one_or_none(id=page_id, user_id=user.id)
+    if not page:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page not found")
+
+    sha256, head = await hash_upload(upload_id, upload.size)
+    if upload.sha256 and upload.sha256 != sha256:
+        # байты повреждены: докачивать нечего, только начинать заново
+        await UploadDAO.remove(upload_id)
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, "Checksum mismatch, upload discarded")
+
+    # файл сессии становится блобом переименованием, без копирования
+    stored = StoredUpload(
+        upload.filename, upload_path(upload_id), upload.size, sha256, sniff_content_type(head, upload.filename)
+    )
+    new_files = await BlobDAO.acquire([stored])
+    await PageLogic.attach_files(page_id, new_files)
+    await UploadDAO.remove(upload_id)
+    return UploadOut(offset=upload.size, size=upload.size, complete=True, file=new_files[0]["name"])
+
+
+@upload_router.delete("/{page_id}/uploads/{upload_id}/")
+async def abort_upload(page_id: int, upload_id: str, user: str = Depends(get_current_user)):
+    await _get_upload(page_id, upload_id, user.id)
+    await UploadDAO.remove(upload_id)
+    return {"ok": True}
@@ -0,0 +1,183 @@
+"""
+Кеш готовых картинок QR, адресуемый по содержимому.
+
+Ключ — sha256 от (данные, стиль с размером, формат), так что одинаковые
+входы дают одну запись. Два уровня: LRU байтов в памяти процесса и
+файлы на диске (общие для всех воркеров), оба ограничены по размеру.
+Индекс диска у каждого воркера свой, поэтому лимит диска соблюдается
+приблизительно — с точностью до записей соседних процессов.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.config import settings
+from src.qr.schemas import QRStyle
+
+CACHE_DIR = Path("uploads/qr_codes/cache")
+
+
+def render_key(payload: str, style: QRStyle, fmt: str) -> str:
+    raw = json.dumps(
+        [payload, style.model_dump(mode="json"), fmt],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+    memory_bytes: int = 0
+    memory_items: int = 0
+    disk_bytes: int = 0
+
+
+class RenderCache:
+    def __init__(self, directory: Path, memory_limit: int, disk_limit: int):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        # индекс диска: ключ -> (путь, размер) в порядке последнего доступа
+        self._disk: OrderedDict[str, tuple[Path, int]] | None = None
+        self._disk_lock = threading.Lock()
+
+    def _path(self, key: str, fmt: str) -> Path:
+        return self.directory / key[:2] / f"{key}.{fmt}"
+
+    # ---------- память ----------
+    def _memory_get(self, key: str) -> bytes | None:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+        return data
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.stats.memory_bytes -= len(old)
+        self._memory[key] = data
+        self.stats.memory_bytes += len(data)
+        while self.stats.memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self.stats.memory_bytes -= len(evicted)
+            self.stats.memory_evictions += 1
+        self.stats.memory_items = len(self._memory)
+
+    # ---------- диск (вызывается из пула потоков) ----------
+    def _load_disk_index(self) -> OrderedDict[str, tuple[Path, int]]:
+        if self._disk is None:
+            entries = []
+            if self.directory.exists():
+                for path in self.directory.glob("*/*.*"):
+                    if path.suffix == ".tmp":
+                        continue
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, path.stem, path, stat.st_size))
+            entries.sort()
+            self._disk = OrderedDict((key, (path, size)) for _, key, path, size in entries)
+            self.stats.disk_bytes = sum(size for _, _, _, size in entries)
+        return self._disk
+
+    def _disk_get(self, key: str, fmt: str) -> bytes | None:
+        path = self._path(key, fmt)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        with self._disk_lock:
+            index = self._load_disk_index()
+            if key in index:
+                index.move_to_end(key)
+        # mtime служит порядком LRU после перезапуска
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def _disk_put(self, key: str, fmt: str, data: bytes) -> None:
+        if len(data) > self.disk_limit:
+            return
+        path = self._path(key, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        evicted = []
+        with self._disk_lock:
+            index = self._load_disk_index()
+            old = index.pop(key, None)
+            if old is not None:
+                self.stats.disk_bytes -= old[1]
+            index[key] = (path, len(data))
+            self.stats.disk_bytes += len(data)
+            while self.stats.disk_bytes > self.disk_limit:
+                _, (old_path, size) = index.popitem(last=False)
+                self.stats.disk_bytes -= size
+                self.stats.disk_evictions += 1
+                evicted.append(old_path)
+        for old_path in evicted:
+            old_path.unlink(missing_ok=True)
+
+    # ---------- публичный интерфейс ----------
+    async def get_or_render(
+        self,
+        payload: str,
+        style: QRStyle,
+        fmt: str,
+        render: Callable[[str, QRStyle], bytes],
+        executor: Executor | None = None,
+    ) -> tuple[str, bytes]:
+        """
+        Возвращает (ключ, байты); рендер вызывается только при промахе обоих
+        уровней — в пуле потоков или в переданном executor (пул процессов).
+        """
+        key = render_key(payload, style, fmt)
+        data = self._memory_get(key)
+        if data is not None:
+            self.stats.memory_hits += 1
+            return key, data
+
+        data = await run_in_threadpool(self._disk_get, key, fmt)
+        if data is not None:
+            self.stats.disk_hits += 1
+            self._memory_put(key, data)
+            return key, data
+
+        self.stats.misses += 1
+        if executor is None:
+            data = await run_in_threadpool(render, payload, style)
+        else:
+            data = await asyncio.get_running_loop().run_in_executor(executor, render, payload, style)
+        self._memory_put(key, data)
+        await run_in_threadpool(self._disk_put, key, fmt, data)
+        return key, data
+
+    def snapshot(self) -> dict:
+        return asdict(self.stats)
+
+
+render_cache = RenderCache(
+    CACHE_DIR,
+    memory_limit=settings.QR_CACHE_MEMORY_BYTES,
+    disk_limit=settings.QR_CACHE_DISK_BYTES,
+)
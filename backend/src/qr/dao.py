@@ -1,9 +1,12 @@
+from sqlalchemy import ARRAY, Integer, String, any_, bindparam, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, status
 from src.dao.base import BaseDAO
-from src.qr.models import QR
+from src.qr.models import QR, QRScanDay, QRScanHour, UserScanDay, UserScanHour
 from src.page.models import Page
 from src.database import with_session
+from src.qr.redirect import link_cache
+from src.qr.shortcode import short_code_allocator
 
 class QRDAO(BaseDAO):
     model = QR
@@ -15,15 +18,20 @@ class QRDAO(BaseDAO):
         name: str,
         src: str,
         description: str,
-        link: str | None = None
+        link: str | None = None,
+        qr_style: dict | None = None
     ) -> QR:
 
+        # номер берётся из блока, зарезервированного воркером: обычно без запроса в БД
+        short_code, = await short_code_allocator.allocate(session)
         qr = QR(
             user_id=user.id,
             name=name,
             description=description,
+            short_code=short_code,
             src=src,
-            link=link  # временно, если None — обновим ниже
+            link=link,  # временно, если None — обновим ниже
+            qr_style=qr_style or {}
         )
         session.add(qr)
         await session.flush()  # нужен qr.id
@@ -52,4 +60,141 @@ class QRDAO(BaseDAO):
                 detail=str(e)
             )
 
-        return qr
\ No newline at end of file
+        return qr
+
+    @classmethod
+    @with_session
+    async def resolve_short_code(cls, session, short_code: str):
+        """(qr_id, link, page_id) одним запросом или None."""
+        data = await session.execute(
+            select(QR.id, QR.link, Page.id)
+            .outerjoin(Page, Page.qr_id == QR.id)
+            .where(QR.short_code == short_code)
+            .limit(1)
+        )
+        return data.first()
+
+    @classmethod
+    async def update(cls, id: int, **values):
+        result = await super().update(id=id, **values)
+        link_cache.invalidate_qr(id)
+        return result
+
+    @classmethod
+    async def update_returning(cls, id: int, values: dict, **filter_by):
+        qr = await super().update_returning(id=id, values=values, **filter_by)
+        link_cache.invalidate_qr(id)
+        return qr
+
+    @classmethod
+    async def delete(cls, id: int, **filter_by):
+        result = await super().delete(id=id, **filter_by)
+        link_cache.invalidate_qr(id)
+        return result
+
+    @classmethod
+    @with_session
+    async def existing_page_names(cls, session, names: list[str]) -> set[str]:
+        # один параметр-массив вместо IN (...): у asyncpg лимит 32767 параметров
+        data = await session.execute(
+            select(Page.name).where(Page.name == any_(bindparam("names", names, type_=ARRAY(String))))
+        )
+        return set(data.scalars().all())
+
+    @classmethod
+    @with_session
+    async def add_many(cls, session, user, items: list[dict]) -> list[tuple[int, str]]:
+        """
+        Пакетная вставка QR и их страниц по умолчанию: по одному многострочному
+        INSERT ... RETURNING на таблицу плюс одно UPDATE ссылок.
+        items — словари с name, description, link, src, qr_style.
+        Возвращает (id, link, short_code) в порядке items.
+        """
+        if not items:
+            return []
+        try:
+            short_codes = await short_code_allocator.allocate(session, len(items))
+            qr_rows = (await session.execute(
+                insert(QR).returning(QR.id, sort_by_parameter_order=True),
+                [
+                    {**item, "user_id": user.id, "short_code": short_code}
+                    for item, short_code in zip(items, short_codes)
+                ],
+            )).scalars().all()
+
+            # страницы нужны только тем, у кого нет своей ссылки
+            pending = [(qr_id, item) for qr_id, item in zip(qr_rows, items) if not item.get("link")]
+            links = {qr_id: item.get("link") for qr_id, item in zip(qr_rows, items)}
+            if pending:
+                page_rows = (await session.execute(
+                    insert(Page).returning(Page.id, Page.qr_id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "user_id": user.id,
+                            "qr_id": qr_id,
+                            "name": item["name"],
+                            "background": {"type": "color", "value": "#ffffff"},
+                            "elements": [],
+                        }
+                        for qr_id, item in pending
+                    ],
+                )).all()
+                for page_id, qr_id in page_rows:
+                    links[qr_id] = f"http://localhost:9000/page/{page_id}"
+                await session.execute(
+                    update(QR),
+                    [{"id": qr_id, "link": links[qr_id]} for _, qr_id in page_rows],
+                )
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        return [(qr_id, links[qr_id], short_code) for qr_id, short_code in zip(qr_rows, short_codes)]
+
+    @classmethod
+    @with_session
+    async def set_sources(cls, session, sources: dict[int, str]) -> None:
+        """Обновляет QR.src пачкой (executemany по первичному ключу)."""
+        if not sources:
+            return
+        await session.execute(update(QR), [{"id": qr_id, "src": src} for qr_id, src in sources.items()])
+        try:
+            await session.commit()
+        except SQLAlchemyError:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    @classmethod
+    @with_session
+    async def export_rows(cls, session, user_id: int, ids: list[int] | None = None):
+        """Только поля, нужные для выгрузки картинок, без загрузки моделей."""
+        query = select(QR.id, QR.name, QR.src, QR.qr_style, QR.short_code).where(QR.user_id == user_id)
+        if ids is not None:
+            query = query.where(QR.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+        data = await session.execute(query.order_by(QR.id))
+        return data.all()
+
+
+class ScanStatsDAO:
+    """Чтение роллупов сканов; сырые события дашборд не трогает."""
+    models = {
+        ("qr", "hour"): QRScanHour,
+        ("qr", "day"): QRScanDay,
+        ("user", "hour"): UserScanHour,
+        ("user", "day"): UserScanDay,
+    }
+
+    @classmethod
+    @with_session
+    async def series(cls, session, scope: str, granularity: str, key: int, since):
+        model = cls.models[(scope, granularity)]
+        key_column = model.qr_id if scope == "qr" else model.user_id
+        data = await session.execute(
+            select(model.bucket, model.scans)
+            .where(key_column == key, model.bucket >= since)
+            .order_by(model.bucket)
+        )
+        return data.all()
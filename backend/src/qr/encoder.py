@@ -0,0 +1,376 @@
+"""
+Кодировщик QR (ISO/IEC 18004): данные -> матрица модулей.
+
+Поддерживается байтовый режим, версии 1-40, уровни коррекции L/M/Q/H.
+Всё, что зависит только от версии (функциональные модули, порядок
+обхода зигзагом, маски), считается один раз и кешируется.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+ERROR_CORRECTION_LEVELS = ("L", "M", "Q", "H")
+
+# биты уровня коррекции в format information
+_ECL_FORMAT_BITS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+# число EC-кодовых слов на блок и число блоков: [уровень][версия]
+_ECC_CODEWORDS_PER_BLOCK = {
+    "L": (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+          28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "M": (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+          26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    "Q": (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+          28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "H": (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+          30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+}
+_NUM_ERROR_CORRECTION_BLOCKS = {
+    "L": (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+          8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    "M": (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+          17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    "Q": (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+          23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    "H": (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+          25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+}
+
+# таблицы GF(256) с порождающим многочленом 0x11D
+_GF_EXP = np.zeros(512, dtype=np.int32)
+_GF_LOG = np.zeros(256, dtype=np.int32)
+_x = 1
+for _i in range(255):
+    _GF_EXP[_i] = _x
+    _GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+_GF_EXP[255:510] = _GF_EXP[:255]
+
+
+class QRCapacityError(ValueError):
+    pass
+
+
+def _num_raw_data_modules(version: int) -> int:
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        num_align = version // 7 + 2
+        result -= (25 * num_align - 10) * num_align - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _num_data_codewords(version: int, ecl: str) -> int:
+    return (
+        _num_raw_data_modules(version) // 8
+        - _ECC_CODEWORDS_PER_BLOCK[ecl][version] * _NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
+    )
+
+
+def _alignment_positions(version: int) -> list[int]:
+    if version == 1:
+        return []
+    size = version * 4 + 17
+    num_align = version // 7 + 2
+    step = (version * 8 + num_align * 3 + 5) // (num_align * 4 - 4) * 2
+    positions = [size - 7 - i * step for i in range(num_align - 1)] + [6]
+    return positions[::-1]
+
+
+@lru_cache(maxsize=None)
+def _rs_generator(degree: int) -> np.ndarray:
+    """Коэффициенты порождающего многочлена Рида-Соломона (без старшего)."""
+    result = np.zeros(degree, dtype=np.int32)
+    result[-1] = 1
+    root = 1
+    for _ in range(degree):
+        # умножаем на (x - root)
+        for j in range(degree):
+            result[j] = _gf_mul(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_mul(root, 0x02)
+    return result
+
+
+def _gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return int(_GF_EXP[_GF_LOG[a] + _GF_LOG[b]])
+
+
+def _rs_remainder(data: np.ndarray, degree: int) -> np.ndarray:
+    generator = _rs_generator(degree)
+    log_generator = _GF_LOG[generator]
+    nonzero = generator != 0
+    result = np.zeros(degree, dtype=np.int32)
+    for byte in data:
+        factor = int(byte) ^ int(result[0])
+        result[:-1] = result[1:]
+        result[-1] = 0
+        if factor:
+            product = np.where(nonzero, _GF_EXP[log_generator + _GF_LOG[factor]], 0)
+            result ^= product
+    return result
+
+
+def _add_ecc_and_interleave(data: bytes, version: int, ecl: str) -> np.ndarray:
+    num_blocks = _NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
+    block_ecc_len = _ECC_CODEWORDS_PER_BLOCK[ecl][version]
+    raw_codewords = _num_raw_data_modules(version) // 8
+    num_short_blocks = num_blocks - raw_codewords % num_blocks
+    short_block_len = raw_codewords // num_blocks
+    short_data_len = short_block_len - block_ecc_len
+
+    payload = np.frombuffer(data, dtype=np.uint8).astype(np.int32)
+    # короткие блоки дополняются фиктивным байтом, чтобы получить прямоугольник
+    blocks = np.zeros((num_blocks, short_block_len + 1), dtype=np.int32)
+    offset = 0
+    for i in range(num_blocks):
+        length = short_data_len + (0 if i < num_short_blocks else 1)
+        chunk = payload[offset:offset + length]
+        offset += length
+        blocks[i, :length] = chunk
+        blocks[i, short_data_len + 1:] = _rs_remainder(chunk, block_ecc_len)
+
+    keep = np.ones_like(blocks, dtype=bool)
+    keep[:num_short_blocks, short_data_len] = False
+    # чередование: читаем столбцами, пропуская фиктивные байты
+    return blocks.T[keep.T].astype(np.uint8)
+
+
+def _format_bits(ecl: str, mask: int) -> int:
+    data = _ECL_FORMAT_BITS[ecl] << 3 | mask
+    rem = data
+    for _ in range(10):
+        rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+    return (data << 10 | rem) ^ 0x5412
+
+
+def _version_bits(version: int) -> int:
+    rem = version
+    for _ in range(12):
+        rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+    return version << 12 | rem
+
+
+@lru_cache(maxsize=None)
+def _function_template(version: int) -> tuple[np.ndarray, np.ndarray]:
+    """Функциональные модули версии: (значения, маска занятости)."""
+    size = version * 4 + 17
+    modules = np.zeros((size, size), dtype=bool)
+    is_function = np.zeros((size, size), dtype=bool)
+
+    # линии синхронизации
+    modules[6, :] = np.arange(size) % 2 == 0
+    modules[:, 6] = np.arange(size) % 2 == 0
+    is_function[6, :] = True
+    is_function[:, 6] = True
+
+    # поисковые узоры с разделителями
+    offsets = np.arange(-4, 5)
+    finder = np.maximum(np.abs(offsets)[:, None], np.abs(offsets)[None, :])
+    finder = (finder != 2) & (finder != 4)
+    for cy, cx in ((3, 3), (3, size - 4), (size - 4, 3)):
+        y0, x0 = max(cy - 4, 0), max(cx - 4, 0)
+        y1, x1 = min(cy + 5, size), min(cx + 5, size)
+        modules[y0:y1, x0:x1] = finder[y0 - cy + 4:y1 - cy + 4, x0 - cx + 4:x1 - cx + 4]
+        is_function[y0:y1, x0:x1] = True
+
+    # выравнивающие узоры
+    positions = _alignment_positions(version)
+    offsets = np.arange(-2, 3)
+    alignment = np.maximum(np.abs(offsets)[:, None], np.abs(offsets)[None, :]) != 1
+    last = len(positions) - 1
+    for i, cy in enumerate(positions):
+        for j, cx in enumerate(positions):
+            if (i, j) in ((0, 0), (0, last), (last, 0)):
+                continue
+            modules[cy - 2:cy + 3, cx - 2:cx + 3] = alignment
+            is_function[cy - 2:cy + 3, cx - 2:cx + 3] = True
+
+    # резервируем место под format information и тёмный модуль
+    is_function[8, :9] = True
+    is_function[:9, 8] = True
+    is_function[8, size - 8:] = True
+    is_function[size - 8:, 8] = True
+    modules[size - 8, 8] = True
+
+    if version >= 7:
+        bits = _version_bits(version)
+        for i in range(18):
+            bit = bool(bits >> i & 1)
+            a, b = size - 11 + i % 3, i // 3
+            modules[b, a] = bit
+            modules[a, b] = bit
+            is_function[b, a] = True
+            is_function[a, b] = True
+
+    modules.flags.writeable = False
+    is_function.flags.writeable = False
+    return modules, is_function
+
+
+@lru_cache(maxsize=None)
+def _codeword_order(version: int) -> tuple[np.ndarray, np.ndarray]:
+    """Координаты (y, x) модулей данных в порядке размещения зигзагом."""
+    size = version * 4 + 17
+    _, is_function = _function_template(version)
+    ys, xs = [], []
+    right = size - 1
+    while right >= 1:
+        if right == 6:
+            right = 5
+        upward = ((right + 1) & 2) == 0
+        rows = range(size - 1, -1, -1) if upward else range(size)
+        for y in rows:
+            for x in (right, right - 1):
+                if not is_function[y, x]:
+                    ys.append(y)
+                    xs.append(x)
+        right -= 2
+    return np.array(ys, dtype=np.intp), np.array(xs, dtype=np.intp)
+
+
+@lru_cache(maxsize=None)
+def _masks(version: int) -> np.ndarray:
+    """Восемь масок версии, уже ограниченных модулями данных."""
+    size = version * 4 + 17
+    _, is_function = _function_template(version)
+    y, x = np.indices((size, size))
+    patterns = np.stack([
+        (x + y) % 2 == 0,
+        y % 2 == 0,
+        x % 3 == 0,
+        (x + y) % 3 == 0,
+        (x // 3 + y // 2) % 2 == 0,
+        x * y % 2 + x * y % 3 == 0,
+        (x * y % 2 + x * y % 3) % 2 == 0,
+        ((x + y) % 2 + x * y % 3) % 2 == 0,
+    ])
+    patterns &= ~is_function
+    patterns.flags.writeable = False
+    return patterns
+
+
+_FINDER_LIKE = np.array([
+    [1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1],
+], dtype=bool)
+
+
+def _run_penalty(lines: np.ndarray) -> int:
+    # разделитель между строками не совпадает ни с одним цветом
+    framed = np.full((lines.shape[0], lines.shape[1] + 1), 2, dtype=np.int8)
+    framed[:, :-1] = lines
+    flat = framed.ravel()
+    starts = np.flatnonzero(np.concatenate(([True], flat[1:] != flat[:-1])))
+    lengths = np.diff(np.append(starts, flat.size))
+    lengths = lengths[(flat[starts] != 2) & (lengths >= 5)]
+    return int((lengths - 2).sum())
+
+
+def _finder_penalty(lines: np.ndarray) -> int:
+    padded = np.zeros((lines.shape[0], lines.shape[1] + 8), dtype=bool)
+    padded[:, 4:-4] = lines
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 11, axis=1)
+    hits = (windows[..., None, :] == _FINDER_LIKE).all(axis=-1).sum()
+    return int(hits) * 40
+
+
+def _penalty(modules: np.ndarray) -> int:
+    size = modules.shape[0]
+    score = _run_penalty(modules) + _run_penalty(modules.T)
+    block = modules[:-1, :-1]
+    same = (block == modules[1:, :-1]) & (block == modules[:-1, 1:]) & (block == modules[1:, 1:])
+    score += int(same.sum()) * 3
+    score += _finder_penalty(modules) + _finder_penalty(modules.T)
+    total = size * size
+    dark = int(modules.sum())
+    k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+    score += k * 10
+    return score
+
+
+def _encode_segment(data: bytes, version: int, ecl: str) -> bytes:
+    capacity_bits = _num_data_codewords(version, ecl) * 8
+    count_bits = 8 if version <= 9 else 16
+    bits = np.concatenate((
+        np.array([0, 1, 0, 0], dtype=np.uint8),
+        np.unpackbits(np.array([len(data)], dtype=">u2").view(np.uint8))[16 - count_bits:],
+        np.unpackbits(np.frombuffer(data, dtype=np.uint8)),
+    ))
+    bits = np.concatenate((bits, np.zeros(min(4, capacity_bits - bits.size), dtype=np.uint8)))
+    bits = np.concatenate((bits, np.zeros(-bits.size % 8, dtype=np.uint8)))
+    codewords = np.packbits(bits)
+    pad = np.resize(np.array([0xEC, 0x11], dtype=np.uint8), capacity_bits // 8 - codewords.size)
+    return np.concatenate((codewords, pad)).tobytes()
+
+
+def choose_version(data: bytes, ecl: str, min_version: int = 1) -> int:
+    for version in range(min_version, 41):
+        count_bits = 8 if version <= 9 else 16
+        if len(data) >= 1 << count_bits:
+            continue
+        if 4 + count_bits + len(data) * 8 <= _num_data_codewords(version, ecl) * 8:
+            return version
+    raise QRCapacityError("Data too long for a QR code")
+
+
+def encode(data: str | bytes, ecl: str = "M", mask: int | None = None) -> np.ndarray:
+    """
+    Кодирует данные в матрицу модулей (True - тёмный модуль), без рамки.
+    Если маска не задана, выбирается маска с минимальным штрафом.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    ecl = ecl.upper()
+    if ecl not in _ECL_FORMAT_BITS:
+        raise ValueError(f"Unknown error correction level: {ecl}")
+
+    version = choose_version(data, ecl)
+    codewords = _add_ecc_and_interleave(_encode_segment(data, version, ecl), version, ecl)
+
+    template, _ = _function_template(version)
+    ys, xs = _codeword_order(version)
+    bits = np.unpackbits(codewords)
+    base = template.copy()
+    base[ys[:bits.size], xs[:bits.size]] = bits.astype(bool)
+
+    masks = _masks(version)
+    candidates = range(8) if mask is None else (mask,)
+    best, best_penalty = None, None
+    for m in candidates:
+        modules = base ^ masks[m]
+        _draw_format_bits(modules, ecl, m)
+        if mask is not None:
+            return modules
+        penalty = _penalty(modules)
+        if best_penalty is None or penalty < best_penalty:
+            best, best_penalty = modules, penalty
+    return best
+
+
+def _draw_format_bits(modules: np.ndarray, ecl: str, mask: int) -> None:
+    size = modules.shape[0]
+    bits = _format_bits(ecl, mask)
+    bit = [bool(bits >> i & 1) for i in range(15)]
+
+    # первая копия — вокруг левого верхнего поискового узора
+    for i in range(6):
+        modules[i, 8] = bit[i]
+    modules[7, 8] = bit[6]
+    modules[8, 8] = bit[7]
+    modules[8, 7] = bit[8]
+    for i in range(9, 15):
+        modules[8, 14 - i] = bit[i]
+
+    # вторая копия — разделена между двумя другими узорами
+    for i in range(8):
+        modules[8, size - 1 - i] = bit[i]
+    for i in range(8, 15):
+        modules[size - 15 + i, 8] = bit[i]
+    modules[size - 8, 8] = True
@@ -0,0 +1,116 @@
+"""
+Потоковая выгрузка картинок QR одним ZIP.
+
+Архив пишется в приёмник без seek (zipfile тогда сам ставит data
+descriptor), и каждый записанный кусок сразу уходит клиенту: ни архив,
+ни файл целиком в памяти не лежат. Файлы QR.src читаются кусками в пуле
+потоков, недостающие форматы рисуются пулом процессов с упреждением на
+EXPORT_LOOKAHEAD картинок.
+"""
+import asyncio
+import io
+import re
+import time
+import zipfile
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.qr.logic import QRLogic
+from src.qr.pool import get_render_pool
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+# сколько картинок готовится заранее, пока предыдущие уходят клиенту
+EXPORT_LOOKAHEAD = 16
+MISSING_MANIFEST = "missing.txt"
+# PNG и PDF уже сжаты внутри, поэтому хранятся как есть; SVG — текст
+COMPRESSED_FORMATS = {"svg"}
+
+_UNSAFE_NAME = re.compile(r'[\x00-\x1f/\\:*?"<>|]+')
+
+
+class _ZipSink(io.RawIOBase):
+    """Приёмник zipfile: копит записанное до следующего drain()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_name(qr_id: int, name: str, fmt: str) -> str:
+    # id в начале: имена QR не уникальны между собой
+    safe = _UNSAFE_NAME.sub("_", name or "").strip(" ._")[:100]
+    return f"{qr_id}-{safe}.{fmt}" if safe else f"{qr_id}.{fmt}"
+
+
+async def _read_chunks(path: Path) -> AsyncIterator[bytes]:
+    file = await run_in_threadpool(path.open, "rb")
+    try:
+        while chunk := await run_in_threadpool(file.read, EXPORT_CHUNK_SIZE):
+            yield chunk
+    finally:
+        await run_in_threadpool(file.close)
+
+
+async def _source(qr, fmt: str) -> Path | bytes | None:
+    """Готовый файл PNG, отрендеренные байты или None, если взять неоткуда."""
+    if fmt == "png" and qr.src:
+        path = Path(qr.src)
+        if await run_in_threadpool(path.is_file):
+            return path
+    return await QRLogic.image(qr, fmt, executor=get_render_pool())
+
+
+async def zip_stream(rows: Sequence, formats: Sequence[str]) -> AsyncIterator[bytes]:
+    """rows — проекции QR (id, name, src, qr_style, short_code)."""
+    jobs = ((qr, fmt) for qr in rows for fmt in formats)
+    pending: deque[tuple] = deque()
+    missing: list[str] = []
+    sink = _ZipSink()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            while True:
+                while len(pending) < EXPORT_LOOKAHEAD and (job := next(jobs, None)):
+                    qr, fmt = job
+                    pending.append((archive_name(qr.id, qr.name, fmt), fmt, asyncio.ensure_future(_source(qr, fmt))))
+                if not pending:
+                    break
+                name, fmt, task = pending.popleft()
+                source = await task
+                if source is None:
+                    missing.append(name)
+                    continue
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                if fmt in COMPRESSED_FORMATS:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w") as entry:
+                    if isinstance(source, Path):
+                        async for chunk in _read_chunks(source):
+                            entry.write(chunk)
+                            if data := sink.drain():
+                                yield data
+                    else:
+                        entry.write(source)
+                if data := sink.drain():
+                    yield data
+            if missing:
+                archive.writestr(MISSING_MANIFEST, "\n".join(missing) + "\n")
+        # центральный каталог пишется при закрытии архива
+        yield sink.drain()
+    finally:
+        # клиент отключился — не рендерим впустую
+        for _, _, task in pending:
+            task.cancel()
@@ -1,4 +1,198 @@
-from src.qr.dao import QRDAO
+import asyncio
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.qr.cache import render_cache, render_key
+from src.qr.dao import QRDAO, ScanStatsDAO
+from src.qr.models import QR
+from src.qr.render import render_pdf, render_png, render_svg
+from src.qr.pool import get_render_pool, pool_size
+from src.qr.shortcode import short_url
+from src.qr.schemas import QRBatchItemResult, QRCreate, QROut, QRStyle, ScanStatsOut, ScanStatsPoint
+
+QR_UPLOAD_DIR = Path("uploads/qr_codes")
+BATCH_MAX_ITEMS = 50_000
+# как часто сбрасывать готовые QR.src в БД при пакетном создании
+BATCH_FLUSH_SIZE = 500
+# формат -> (media type, рендер)
+IMAGE_FORMATS = {
+    "png": ("image/png", render_png),
+    "svg": ("image/svg+xml", render_svg),
+    "pdf": ("application/pdf", render_pdf),
+}
+# длина версии в URL картинки (?v=), префикс ключа рендера
+IMAGE_VERSION_LENGTH = 16
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
 
 class QRLogic(QRDAO):
-    ...
\ No newline at end of file
+    @staticmethod
+    async def render_image(user_id: int, payload: str, style: QRStyle, executor: Executor | None = None) -> str:
+        _, png = await render_cache.get_or_render(payload, style, "png", render_png, executor)
+        file_path = QR_UPLOAD_DIR / str(user_id) / f"{uuid.uuid4()}.png"
+        await run_in_threadpool(_write_file, file_path, png)
+        return str(file_path)
+
+    @staticmethod
+    def image_style(qr: QR, size: int | None = None) -> QRStyle:
+        style = QRStyle(**(qr.qr_style or {}))
+        return style.model_copy(update={"size": size}) if size else style
+
+    @classmethod
+    def image_version(cls, qr: QR, fmt: str = "png", size: int | None = None) -> str:
+        """
+        Версия картинки без рендера: ключ кеша рендера, для старых QR без
+        стиля — хеш пути к файлу (каждый рендер пишет новый файл).
+        """
+        if not qr.qr_style and fmt == "png" and size is None:
+            return hashlib.sha256(qr.src.encode("utf-8")).hexdigest()
+        return render_key(short_url(qr.short_code), cls.image_style(qr, size), fmt)
+
+    @staticmethod
+    def image_url(qr_id: int, version: str) -> str:
+        return f"/qr/{qr_id}/image/?v={version[:IMAGE_VERSION_LENGTH]}"
+
+    @classmethod
+    def image_src(cls, qr: QR) -> str:
+        return cls.image_url(qr.id, cls.image_version(qr))
+
+    @classmethod
+    async def image(
+        cls, qr: QR, fmt: str = "png", size: int | None = None, executor: Executor | None = None
+    ) -> bytes | None:
+        """
+        Картинка из кеша рендера; None для старых QR без сохранённого стиля
+        (их PNG отдаётся файлом). Остальные форматы для них рисуются стилем
+        по умолчанию.
+        """
+        if not qr.qr_style and fmt == "png" and size is None:
+            return None
+        _, data = await render_cache.get_or_render(
+            short_url(qr.short_code), cls.image_style(qr, size), fmt, IMAGE_FORMATS[fmt][1], executor
+        )
+        return data
+
+    @classmethod
+    async def create(cls, user, data: QRCreate) -> QR:
+        # в картинке — короткая ссылка, а не QR.link: цель можно менять без перерисовки,
+        # и каждый скан проходит через редирект (аналитика)
+        qr = await cls.add(
+            user=user,
+            name=data.name,
+            description=data.description,
+            link=data.link,
+            src="",
+            qr_style=data.qr_style.model_dump(),
+        )
+        qr.src = await cls.render_image(qr.user_id, short_url(qr.short_code), data.qr_style)
+        await cls.update(id=qr.id, src=qr.src)
+        return qr
+
+    @classmethod
+    async def insert_many(cls, user, items: list[QRCreate]) -> tuple[list[QRBatchItemResult], list[tuple]]:
+        """
+        Вставка пачки несколькими запросами. Возвращает отклонённые элементы
+        и принятые как (index, item, qr_id, link, short_code).
+        """
+        # имена страниц уникальны: отсеиваем конфликты заранее, а не откатом всей пачки
+        page_names = [item.name for item in items if not item.link]
+        taken = await cls.existing_page_names(names=page_names) if page_names else set()
+        rejected, accepted = [], []
+        for index, item in enumerate(items):
+            if not item.link and item.name in taken:
+                rejected.append(QRBatchItemResult(
+                    index=index, ok=False, error=f"Page with name '{item.name}' already exists"
+                ))
+                continue
+            if not item.link:
+                taken.add(item.name)
+            accepted.append((index, item))
+
+        rows = await cls.add_many(
+            user=user,
+            items=[
+                {
+                    "name": item.name,
+                    "description": item.description,
+                    "link": item.link,
+                    "src": "",
+                    "qr_style": item.qr_style.model_dump(),
+                }
+                for _, item in accepted
+            ],
+        )
+        return rejected, [(index, item, *row) for (index, item), row in zip(accepted, rows)]
+
+    @classmethod
+    async def render_many(cls, user, accepted: list[tuple]) -> AsyncIterator[QRBatchItemResult]:
+        """Рендер вставленной пачки на пуле процессов; результаты — по мере готовности."""
+        pool = get_render_pool()
+        queue: asyncio.Queue = asyncio.Queue()
+        jobs = iter(accepted)
+
+        async def worker():
+            for index, item, qr_id, link, short_code in jobs:
+                try:
+                    src = await cls.render_image(user.id, short_url(short_code), item.qr_style, pool)
+                except Exception as e:
+                    await queue.put((index, item, qr_id, link, short_code, None, str(e)))
+                else:
+                    await queue.put((index, item, qr_id, link, short_code, src, None))
+
+        # воркеров вдвое больше процессов, чтобы пул не простаивал на I/O
+        workers = [asyncio.create_task(worker()) for _ in range(min(pool_size() * 2, len(accepted)))]
+        sources = {}
+        try:
+            for _ in range(len(accepted)):
+                index, item, qr_id, link, short_code, src, error = await queue.get()
+                if error:
+                    yield QRBatchItemResult(index=index, ok=False, error=error)
+                    continue
+                sources[qr_id] = src
+                if len(sources) >= BATCH_FLUSH_SIZE:
+                    await cls.set_sources(sources=sources)
+                    sources = {}
+                yield QRBatchItemResult(
+                    index=index,
+                    ok=True,
+                    qr=QROut(
+                        id=qr_id,
+                        name=item.name,
+                        description=item.description,
+                        link=link,
+                        short_code=short_code,
+                        src=cls.image_url(qr_id, render_key(short_url(short_code), item.qr_style, "png")),
+                    ),
+                )
+        finally:
+            for task in workers:
+                task.cancel()
+            if sources:
+                await cls.set_sources(sources=sources)
+
+    @staticmethod
+    async def scan_stats(scope: str, key: int, granularity: str, days: int) -> ScanStatsOut:
+        """Ряд по роллапам с нулями в пустых интервалах (время — UTC)."""
+        step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+        now = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+        if granularity == "day":
+            now = now.replace(hour=0)
+        since = now - step * (days * (24 if granularity == "hour" else 1) - 1)
+
+        rows = dict(await ScanStatsDAO.series(scope=scope, granularity=granularity, key=key, since=since))
+        points = []
+        bucket = since
+        while bucket <= now:
+            points.append(ScanStatsPoint(bucket=bucket, scans=rows.get(bucket, 0)))
+            bucket += step
+        return ScanStatsOut(granularity=granularity, total=sum(p.scans for p in points), points=points)
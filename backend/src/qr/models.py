@@ -1,6 +1,7 @@
 from src.database import Base, int_pk, str_uniq
+from datetime import datetime
 from sqlalchemy.orm import Mapped, relationship, mapped_column
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, JSON
 
 class QR(Base):
     id: Mapped[int_pk]
@@ -9,9 +10,55 @@ class QR(Base):
     name: Mapped[str]
     link: Mapped[str] = mapped_column(nullable=True)
     src: Mapped[str]
+    qr_style: Mapped[dict] = mapped_column(JSON, default={})
+    scan_count: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
     
     user: Mapped['User'] = relationship('User', back_populates='qrs')
     page: Mapped["Page"] = relationship('Page', back_populates='qr')
 
     short_code: Mapped[str_uniq] = mapped_column(unique=True)
-    link: Mapped[str | None] = mapped_column(nullable=True)
\ No newline at end of file
+    link: Mapped[str | None] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        # листинг пользователя по курсору: WHERE user_id = ? AND id > ? ORDER BY id
+        Index('ix_qrs_user_id_id', 'user_id', 'id'),
+    )
+
+
+class ScanEvent(Base):
+    # пишется пачками через COPY из src.qr.scans, не через ORM
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    qr_id: Mapped[int] = mapped_column(ForeignKey('qrs.id', ondelete='CASCADE'))
+    scanned_at: Mapped[datetime] = mapped_column(DateTime)
+    user_agent: Mapped[str | None]
+    referrer: Mapped[str | None]
+
+    __table_args__ = (
+        Index('ix_scanevents_qr_id_scanned_at', 'qr_id', 'scanned_at'),
+    )
+
+
+# роллапы сканов: ведутся инкрементально при сбросе буфера сканов,
+# дашборд читает только их
+class QRScanHour(Base):
+    qr_id: Mapped[int] = mapped_column(ForeignKey('qrs.id', ondelete='CASCADE'), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    scans: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class QRScanDay(Base):
+    qr_id: Mapped[int] = mapped_column(ForeignKey('qrs.id', ondelete='CASCADE'), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    scans: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class UserScanHour(Base):
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    scans: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class UserScanDay(Base):
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    scans: Mapped[int] = mapped_column(BigInteger, default=0)
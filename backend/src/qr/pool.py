@@ -0,0 +1,33 @@
+"""
+Пул процессов для CPU-тяжёлого рендера (пакетное создание, листы печати).
+Создаётся лениво и закрывается при остановке приложения.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import settings
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def pool_size() -> int:
+    return settings.QR_RENDER_WORKERS or os.cpu_count() or 1
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: форк процесса с работающим event loop и потоками небезопасен
+        _pool = ProcessPoolExecutor(
+            max_workers=pool_size(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
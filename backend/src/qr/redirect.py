@@ -0,0 +1,79 @@
+"""
+Кеш разрешения коротких кодов: short_code -> адрес перехода.
+
+Сканы — самый горячий путь, поэтому попадание в кеш не ходит в БД.
+Записи сбрасываются из DAO при изменении QR или страницы; у каждого
+воркера свой кеш, поэтому TTL ограничивает устаревание чужих записей.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.config import settings
+
+
+@dataclass(slots=True)
+class Resolved:
+    target: str
+    qr_id: int
+    page_id: int | None
+    expires: float
+
+
+class LinkCache:
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: OrderedDict[str, Resolved] = OrderedDict()
+        self._by_qr: dict[int, str] = {}
+        self._by_page: dict[int, str] = {}
+
+    def get(self, short_code: str) -> Resolved | None:
+        item = self._items.get(short_code)
+        if item is None:
+            return None
+        if item.expires < time.monotonic():
+            self._drop(short_code)
+            return None
+        self._items.move_to_end(short_code)
+        return item
+
+    def put(self, short_code: str, target: str, qr_id: int, page_id: int | None) -> None:
+        self._drop(short_code)
+        self._items[short_code] = Resolved(target, qr_id, page_id, time.monotonic() + self.ttl)
+        self._by_qr[qr_id] = short_code
+        if page_id is not None:
+            self._by_page[page_id] = short_code
+        while len(self._items) > self.max_items:
+            self._drop(next(iter(self._items)))
+
+    def _drop(self, short_code: str) -> None:
+        item = self._items.pop(short_code, None)
+        if item is None:
+            return
+        if self._by_qr.get(item.qr_id) == short_code:
+            del self._by_qr[item.qr_id]
+        if item.page_id is not None and self._by_page.get(item.page_id) == short_code:
+            del self._by_page[item.page_id]
+
+    def invalidate_qr(self, qr_id: int) -> None:
+        short_code = self._by_qr.get(qr_id)
+        if short_code is not None:
+            self._drop(short_code)
+
+    def invalidate_page(self, page_id: int) -> None:
+        short_code = self._by_page.get(page_id)
+        if short_code is not None:
+            self._drop(short_code)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._by_qr.clear()
+        self._by_page.clear()
+
+
+def page_view_url(page_id: int) -> str:
+    return f"{settings.FRONTEND_URL}/viewPage/{page_id}"
+
+
+link_cache = LinkCache(max_items=settings.SHORT_LINK_CACHE_SIZE, ttl=settings.SHORT_LINK_CACHE_TTL)
@@ -0,0 +1,45 @@
+# src/qr/redirect_router.py
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import RedirectResponse
+
+from src.qr.dao import QRDAO
+from src.qr.redirect import link_cache, page_view_url
+from src.qr.scans import scan_buffer
+from src.qr.shortcode import short_url
+from src.page.snapshot import snapshot_response
+
+redirect_router = APIRouter(tags=['Short Links'])
+
+
+async def _record_scan(qr_id: int, request: Request) -> None:
+    await scan_buffer.record(qr_id, request.headers.get("user-agent"), request.headers.get("referer"))
+
+
+def _respond(target: str, page_id: int | None):
+    # страница со снимком отдаётся сразу: без редиректа, бандла и запроса к API
+    if page_id is not None and (snapshot := snapshot_response(page_id)) is not None:
+        return snapshot
+    # 302, а не 301: цель можно поменять, а 301 браузеры кешируют навсегда
+    return RedirectResponse(target, status_code=status.HTTP_302_FOUND)
+
+
+@redirect_router.get("/{short_code}")
+async def resolve_short_code(short_code: str, request: Request):
+    cached = link_cache.get(short_code)
+    if cached is not None:
+        await _record_scan(cached.qr_id, request)
+        return _respond(cached.target, cached.page_id)
+
+    row = await QRDAO.resolve_short_code(short_code=short_code)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="QR not found")
+
+    qr_id, link, page_id = row
+    target = page_view_url(page_id) if page_id is not None else link
+    # ссылка на собственный короткий адрес — бесконечный редирект
+    if not target or target == short_url(short_code):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="QR has no target")
+
+    link_cache.put(short_code, target, qr_id, page_id)
+    await _record_scan(qr_id, request)
+    return _respond(target, page_id)
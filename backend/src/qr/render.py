@@ -0,0 +1,389 @@
+"""
+Растеризация и векторизация матрицы QR.
+
+Растр: модуль занимает целое число пикселей, поэтому картинка собирается из
+заранее посчитанных плиток s x s: форма плитки зависит только от стиля
+и соседей модуля. Сборка — это один fancy-indexing NumPy без циклов
+по пикселям.
+
+Вектор (SVG, PDF): тот же стиль описывается одним контуром из
+скруглённых прямоугольников в единицах модуля, заливка even-odd.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+from src.qr.encoder import encode
+from src.qr.schemas import QRColors, QRStyle
+
+# радиус точки для pattern="dots" в долях модуля
+DOT_RADIUS = 0.45
+# число оттенков градиента (индекс 0 палитры занят фоном)
+GRADIENT_STEPS = 255
+# уровень zlib: выше 3 почти не уменьшает файл, но втрое медленнее
+PNG_COMPRESS_LEVEL = 3
+# радиусы колец и центра поискового узора в модулях (внешний, внутренний, центр)
+EYE_RADII = {"square": (0, 0, 0), "rounded": (1.5, 1.0, 0.75), "dots": (3.5, 2.5, 1.5)}
+# четверть окружности кубической кривой Безье
+_KAPPA = 0.5523
+
+
+def parse_color(value: str) -> tuple[int, int, int]:
+    value = value.lstrip("#")
+    if len(value) == 3:
+        value = "".join(ch * 2 for ch in value)
+    if len(value) != 6:
+        raise ValueError(f"Invalid color: #{value}")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _cell_coords(scale: int) -> np.ndarray:
+    """Координаты центров пикселей внутри модуля, от 0 до 1."""
+    return (np.arange(scale) + 0.5) / scale
+
+
+def _rounded_box(dx: np.ndarray, dy: np.ndarray, half: float, radius: float) -> np.ndarray:
+    """Пиксели внутри квадрата со скруглёнными углами (SDF <= 0)."""
+    qx = np.maximum(dx - (half - radius), 0)
+    qy = np.maximum(dy - (half - radius), 0)
+    return qx * qx + qy * qy <= radius * radius
+
+
+def _eye_tile(scale: int, eye_style: str) -> np.ndarray:
+    """Поисковый узор 7x7 модулей в пикселях."""
+    coords = np.arange(7 * scale) / scale + 0.5 / scale - 3.5
+    dy = np.abs(coords)[:, None]
+    dx = np.abs(coords)[None, :]
+    if eye_style == "dots":
+        dist = np.sqrt(dx * dx + dy * dy)
+        return ((dist <= 3.5) & (dist >= 2.5)) | (dist <= 1.5)
+    if eye_style == "rounded":
+        ring = _rounded_box(dx, dy, 3.5, 1.5) & ~_rounded_box(dx, dy, 2.5, 1.0)
+        return ring | _rounded_box(dx, dy, 1.5, 0.75)
+    cheb = np.maximum(dx, dy)
+    return (cheb <= 1.5) | ((cheb >= 2.5) & (cheb <= 3.5))
+
+
+def _rounded_tiles(scale: int) -> np.ndarray:
+    """
+    16 плиток по маске соседей (верх, низ, лево, право): угол модуля
+    скругляется, если оба соседа с этой стороны светлые.
+    """
+    c = _cell_coords(scale)
+    outside = ((c - 0.5) ** 2)[:, None] + ((c - 0.5) ** 2)[None, :] > 0.25
+    top = (c < 0.5)[:, None]
+    west = (c < 0.5)[None, :]
+    config = np.arange(16)[:, None, None]
+    up, down = config >> 3 & 1, config >> 2 & 1
+    left, right = config >> 1 & 1, config & 1
+    vertical = np.where(top, up, down).astype(bool)
+    horizontal = np.where(west, left, right).astype(bool)
+    return ~(outside & ~vertical & ~horizontal)
+
+
+def _tile_grid(tiles: np.ndarray) -> np.ndarray:
+    """(n, n, s, s) -> (n*s, n*s)."""
+    n, _, s, _ = tiles.shape
+    return tiles.transpose(0, 2, 1, 3).reshape(n * s, n * s)
+
+
+def rasterize(modules: np.ndarray, style: QRStyle, size: int | None = None) -> np.ndarray:
+    """
+    Булева маска size x size (True — тёмный пиксель). Модули целочисленные,
+    остаток от деления size на число модулей уходит в поля.
+    """
+    size = size or style.size
+    n = modules.shape[0]
+    total = n + 2 * style.border
+    scale = max(size // total, 1)
+    size = max(size, total * scale)
+
+    # поисковые узоры рисуются отдельно, поэтому убираем их из матрицы
+    body = modules.copy()
+    body[:7, :7] = False
+    body[:7, n - 7:] = False
+    body[n - 7:, :7] = False
+
+    if style.pattern == "dots":
+        c = _cell_coords(scale)
+        dot = ((c - 0.5) ** 2)[:, None] + ((c - 0.5) ** 2)[None, :] <= DOT_RADIUS ** 2
+        image = _tile_grid(body[:, :, None, None] & dot)
+    elif style.pattern == "rounded":
+        padded = np.pad(body, 1)
+        config = (
+            padded[:-2, 1:-1].astype(np.intp) << 3
+            | padded[2:, 1:-1].astype(np.intp) << 2
+            | padded[1:-1, :-2].astype(np.intp) << 1
+            | padded[1:-1, 2:].astype(np.intp)
+        )
+        image = _tile_grid(_rounded_tiles(scale)[config] & body[:, :, None, None])
+    else:
+        image = np.repeat(np.repeat(body, scale, axis=0), scale, axis=1)
+
+    eye = _eye_tile(scale, style.eye_style)
+    span = 7 * scale
+    for y, x in ((0, 0), (0, n - 7), (n - 7, 0)):
+        image[y * scale:y * scale + span, x * scale:x * scale + span] |= eye
+
+    canvas = np.zeros((size, size), dtype=bool)
+    offset = (size - n * scale) // 2
+    canvas[offset:offset + n * scale, offset:offset + n * scale] = image
+    return canvas
+
+
+def colorize(dark: np.ndarray, colors: QRColors) -> tuple[np.ndarray, list[tuple[int, int, int]]]:
+    """
+    Индексы палитры и сама палитра. Без градиента палитра двухцветная,
+    с градиентом — фон плюс GRADIENT_STEPS оттенков по диагонали.
+    """
+    background = parse_color(colors.background)
+    if not colors.gradient:
+        return dark, [background, parse_color(colors.foreground)]
+
+    start, end = (np.array(parse_color(c), dtype=np.float32) for c in colors.gradient)
+    steps = np.linspace(0, 1, GRADIENT_STEPS, dtype=np.float32)[:, None]
+    palette = [background] + [tuple(rgb) for rgb in np.rint(start + (end - start) * steps).astype(int).tolist()]
+
+    height, width = dark.shape
+    ramp = np.arange(height + width - 1) * (GRADIENT_STEPS - 1) // max(height + width - 2, 1) + 1
+    # строка y градиента — это ramp[y:y + width], окна берутся без копирования
+    diagonal = np.lib.stride_tricks.sliding_window_view(ramp.astype(np.uint8), width)[:height]
+    return np.where(dark, diagonal, np.uint8(0)), palette
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(payload)) + kind + payload
+        + struct.pack(">I", zlib.crc32(kind + payload) & 0xFFFFFFFF)
+    )
+
+
+def _png(width: int, height: int, bit_depth: int, color_type: int, rows: np.ndarray, extra: bytes = b"") -> bytes:
+    # фильтр 0 (None) в начале каждой строки
+    raw = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+        + extra
+        + _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), PNG_COMPRESS_LEVEL))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def encode_png(indexes: np.ndarray, palette: list[tuple[int, int, int]]) -> bytes:
+    """PNG с палитрой: 1 бит на пиксель для двух цветов, иначе 8 бит."""
+    height, width = indexes.shape
+    if len(palette) <= 2:
+        rows = np.packbits(indexes.astype(bool), axis=1)
+        bit_depth = 1
+    else:
+        rows = indexes.astype(np.uint8, copy=False)
+        bit_depth = 8
+    plte = _png_chunk(b"PLTE", b"".join(bytes(rgb) for rgb in palette))
+    return _png(width, height, bit_depth, 3, rows, plte)
+
+
+def encode_png_rgb(pixels: np.ndarray) -> bytes:
+    """PNG truecolor из массива (h, w, 3) uint8."""
+    height, width, _ = pixels.shape
+    return _png(width, height, 8, 2, pixels.reshape(height, width * 3))
+
+
+def render_png(data: str, style: QRStyle) -> bytes:
+    modules = encode(data, style.error_correction)
+    indexes, palette = colorize(rasterize(modules, style), style.colors)
+    return encode_png(indexes, palette)
+
+
+# =====================
+# ВЕКТОР
+# =====================
+def _rounded_rect(x: float, y: float, w: float, h: float, radii: tuple[float, ...]) -> list[tuple]:
+    """Замкнутый контур по часовой стрелке; radii — (tl, tr, br, bl)."""
+    tl, tr, br, bl = radii
+    k = 1 - _KAPPA
+    ops = [("M", x + tl, y), ("L", x + w - tr, y)]
+    if tr:
+        ops.append(("C", x + w - tr * k, y, x + w, y + tr * k, x + w, y + tr))
+    ops.append(("L", x + w, y + h - br))
+    if br:
+        ops.append(("C", x + w, y + h - br * k, x + w - br * k, y + h, x + w - br, y + h))
+    ops.append(("L", x + bl, y + h))
+    if bl:
+        ops.append(("C", x + bl * k, y + h, x, y + h - bl * k, x, y + h - bl))
+    ops.append(("L", x, y + tl))
+    if tl:
+        ops.append(("C", x, y + tl * k, x + tl * k, y, x + tl, y))
+    ops.append(("Z",))
+    return ops
+
+
+def vector_path(modules: np.ndarray, style: QRStyle) -> list[tuple]:
+    """
+    Контур всех тёмных модулей в координатах холста (с полями), 1 = модуль.
+    Фигуры не пересекаются, кольца глаз — вложенные контуры, поэтому
+    весь QR заливается одним путём по правилу even-odd.
+    """
+    n = modules.shape[0]
+    b = style.border
+    body = modules.copy()
+    body[:7, :7] = False
+    body[:7, n - 7:] = False
+    body[n - 7:, :7] = False
+
+    ops: list[tuple] = []
+    if style.pattern == "squares":
+        # горизонтальные серии модулей — одним прямоугольником
+        padded = np.pad(body, ((0, 0), (1, 1)))
+        edges = np.diff(padded.astype(np.int8), axis=1)
+        for y, x in zip(*np.nonzero(edges == 1)):
+            run = np.argmax(edges[y, x:] == -1)
+            ops += _rounded_rect(b + x, b + y, run, 1, (0, 0, 0, 0))
+    elif style.pattern == "dots":
+        pad = 0.5 - DOT_RADIUS
+        for y, x in zip(*np.nonzero(body)):
+            ops += _rounded_rect(b + x + pad, b + y + pad, 2 * DOT_RADIUS, 2 * DOT_RADIUS, (DOT_RADIUS,) * 4)
+    else:
+        padded = np.pad(body, 1)
+        for y, x in zip(*np.nonzero(body)):
+            up, down = padded[y, x + 1], padded[y + 2, x + 1]
+            left, right = padded[y + 1, x], padded[y + 1, x + 2]
+            radii = tuple(
+                0 if a or c else 0.5
+                for a, c in ((up, left), (up, right), (down, right), (down, left))
+            )
+            ops += _rounded_rect(b + x, b + y, 1, 1, radii)
+
+    outer, inner, center = EYE_RADII[style.eye_style]
+    for y, x in ((0, 0), (0, n - 7), (n - 7, 0)):
+        ops += _rounded_rect(b + x, b + y, 7, 7, (outer,) * 4)
+        ops += _rounded_rect(b + x + 1, b + y + 1, 5, 5, (inner,) * 4)
+        ops += _rounded_rect(b + x + 2, b + y + 2, 3, 3, (center,) * 4)
+    return ops
+
+
+def _num(value: float) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+def _svg_path(ops: list[tuple]) -> str:
+    return "".join(op[0] + " ".join(_num(v) for v in op[1:]) for op in ops)
+
+
+def render_svg(data: str, style: QRStyle) -> bytes:
+    """SVG style.size x style.size пикселей; viewBox — в модулях."""
+    modules = encode(data, style.error_correction)
+    total = modules.shape[0] + 2 * style.border
+    colors = style.colors
+    fill = colors.foreground
+    defs = ""
+    if colors.gradient:
+        # диагональ всего холста, как у растрового градиента
+        start, end = colors.gradient
+        defs = (
+            f'<defs><linearGradient id="g" gradientUnits="userSpaceOnUse" x1="0" y1="0" x2="{total}" y2="{total}">'
+            f'<stop offset="0" stop-color="{start}"/><stop offset="1" stop-color="{end}"/></linearGradient></defs>'
+        )
+        fill = "url(#g)"
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {total} {total}" '
+        f'width="{style.size}" height="{style.size}">{defs}'
+        f'<rect width="{total}" height="{total}" fill="{colors.background}"/>'
+        f'<path fill-rule="evenodd" fill="{fill}" d="{_svg_path(vector_path(modules, style))}"/>'
+        "</svg>"
+    ).encode("utf-8")
+
+
+_PDF_OPERATORS = {"M": "m", "L": "l", "C": "c", "Z": "h"}
+
+
+def _pdf_rgb(color: str) -> str:
+    return " ".join(_num(c / 255) for c in parse_color(color))
+
+
+def pdf_qr_content(modules: np.ndarray, style: QRStyle, shading: str | None = None) -> str:
+    """
+    Операторы PDF, рисующие QR в квадрате 0..1 текущей системы координат
+    (ось y вверх). Для градиента нужен ресурс осевой заливки shading.
+    """
+    total = modules.shape[0] + 2 * style.border
+    colors = style.colors
+    # единицы модуля -> квадрат 0..1, ось y вниз, как в SVG
+    lines = [f"q {1 / total:.6f} 0 0 {-1 / total:.6f} 0 1 cm"]
+    lines.append(f"{_pdf_rgb(colors.background)} rg 0 0 {total} {total} re f")
+    # цвет задаётся до построения пути: внутри пути допустимы только операторы контура
+    lines.append(f"{_pdf_rgb(colors.foreground)} rg")
+    for op in vector_path(modules, style):
+        lines.append(" ".join(_num(v) for v in op[1:]) + (" " if len(op) > 1 else "") + _PDF_OPERATORS[op[0]])
+    if colors.gradient and shading:
+        lines.append(f"W* n /{shading} sh Q")
+    else:
+        lines.append("f* Q")
+    return "\n".join(lines)
+
+
+def pdf_shading(style: QRStyle, modules_count: int) -> str:
+    """Словарь осевой заливки по диагонали холста (в единицах модуля)."""
+    total = modules_count + 2 * style.border
+    start, end = style.colors.gradient
+    return (
+        f"<< /ShadingType 2 /ColorSpace /DeviceRGB /Coords [0 0 {total} {total}] "
+        f"/Function << /FunctionType 2 /Domain [0 1] /C0 [{_pdf_rgb(start)}] /C1 [{_pdf_rgb(end)}] /N 1 >> "
+        "/Extend [true true] >>"
+    )
+
+
+def _pdf_stream(entries: str, stream: bytes) -> bytes:
+    """entries — содержимое словаря потока без /Length."""
+    return f"<< {entries} /Length {len(stream)} >>\nstream\n".encode("latin-1") + stream + b"\nendstream"
+
+
+def pdf_document(pages: list[tuple[float, float, str, dict[str, dict[str, tuple[str, bytes | None]]]]]) -> bytes:
+    """
+    Минимальный PDF 1.4. pages — (ширина, высота в pt, операторы, ресурсы).
+    Ресурсы — {категория: {имя: (словарь, поток или None)}}, например
+    {"Shading": {"Sh0": ("<< ... >>", None)}}; у потока словарь без скобок
+    и /Length. Операторы страницы сжимаются zlib.
+    """
+    objects: list[bytes] = [b"", b""]  # каталог и дерево страниц — в конце
+    kids = []
+    for width, height, content, resources in pages:
+        categories = []
+        for category, named in resources.items():
+            refs = []
+            for name, (entries, stream) in named.items():
+                objects.append(entries.encode("latin-1") if stream is None else _pdf_stream(entries, stream))
+                refs.append(f"/{name} {len(objects)} 0 R")
+            categories.append(f"/{category} << {' '.join(refs)} >>")
+        objects.append(_pdf_stream(
+            "/Filter /FlateDecode", zlib.compress(content.encode("latin-1"), PNG_COMPRESS_LEVEL)
+        ))
+        contents = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(width)} {_num(height)}] "
+            f"/Resources << {' '.join(categories)} >> /Contents {contents} 0 R >>".encode("latin-1")
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def render_pdf(data: str, style: QRStyle) -> bytes:
+    """Одностраничный векторный PDF, сторона — style.size pt."""
+    modules = encode(data, style.error_correction)
+    resources = {"Shading": {"Sh0": (pdf_shading(style, modules.shape[0]), None)}} if style.colors.gradient else {}
+    content = f"q {style.size} 0 0 {style.size} 0 0 cm\n{pdf_qr_content(modules, style, 'Sh0')}\nQ"
+    return pdf_document([(style.size, style.size, content, resources)])
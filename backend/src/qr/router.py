@@ -1,46 +1,37 @@
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Literal
 
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Request,
 )
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
-from src.qr.schemas import QRCreate, QRUpdate, QROut
+from src.qr.schemas import QRBatchItemResult, QRCreate, QRListOut, QRUpdate, QROut, ScanStatsOut, SheetRequest
 from src.qr.dao import QRDAO
+from src.qr.models import QR
+from src.qr.export import zip_stream
+from src.qr.logic import BATCH_MAX_ITEMS, IMAGE_FORMATS, IMAGE_VERSION_LENGTH, QRLogic
+from src.qr.scans import scan_buffer
+from src.qr.sheet import render_sheet
+from src.qr.shortcode import short_url
 from src.user.dependencies import get_current_user
+from src.http_cache import etag_matches
 
 router = APIRouter(prefix="/qr", tags=["QR"])
 
-QR_ASSETS_DIR = Path("assets/qr")
-
-
-# =====================
-# UTILS
-# =====================
-# def resolve_qr_image(qr_style: Dict[str, Any]) -> Path:
-#     """
-#     По qr_style выбирает существующий шаблон QR
-#     """
-#     pattern = qr_style.get("pattern")
-#     eye_style = qr_style.get("eye_style")
-
-#     if not pattern or not eye_style:
-#         raise HTTPException(400, "qr_style must contain pattern and eye_style")
-
-#     file_name = f"{pattern}_{eye_style}.png"
-#     file_path = QR_ASSETS_DIR / file_name
-
-#     if not file_path.exists():
-#         raise HTTPException(
-#             status_code=404,
-#             detail=f"QR template not found: {file_name}",
-#         )
-
-#     return file_path
-
+# начиная с этого размера пачки результаты отдаются потоком NDJSON
+BATCH_STREAM_THRESHOLD = 200
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+# колонки для списка: всё, что нужно QROut, без загрузки моделей
+LIST_COLUMNS = [QR.id, QR.name, QR.description, QR.link, QR.short_code, QR.src, QR.qr_style, QR.scan_count]
+# картинка по версионному URL (?v=) не меняется никогда; без версии — только с перепроверкой ETag
+IMAGE_CACHE_IMMUTABLE = "private, max-age=31536000, immutable"
+IMAGE_CACHE_REVALIDATE = "private, no-cache"
 
 # =====================
 # CREATE
@@ -50,43 +41,140 @@ async def create_qr(
     data: QRCreate,
     user=Depends(get_current_user),
 ):
-    # image_path = resolve_qr_image(data.qr_style)
-    image_path = "../../uploads/qr_codes/1/1894c9c8-5471-4fd0-a801-1e010686e6ff.jpg"
-
-    qr = await QRDAO.add(
-        user=user,
-        name=data.name,
-        description=data.description,
-        link=data.link,
-        src=str(image_path),
-    )
+    qr = await QRLogic.create(user=user, data=data)
 
     return QROut(
         id=qr.id,
         name=qr.name,
         description=qr.description,
         link=qr.link,
-        src=f"/qr/{qr.id}/image/",
+        short_code=qr.short_code,
+        src=QRLogic.image_src(qr),
+    )
+
+
+# =====================
+# CREATE BATCH
+# =====================
+@router.post("/batch/", response_model=List[QRBatchItemResult])
+async def create_qr_batch(
+    items: List[QRCreate],
+    stream: bool = False,
+    user=Depends(get_current_user),
+):
+    if not items:
+        raise HTTPException(400, "Empty batch")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"Batch is limited to {BATCH_MAX_ITEMS} items")
+
+    rejected, accepted = await QRLogic.insert_many(user=user, items=items)
+    results = QRLogic.render_many(user=user, accepted=accepted)
+
+    if stream or len(items) > BATCH_STREAM_THRESHOLD:
+        async def ndjson():
+            for result in rejected:
+                yield result.model_dump_json() + "\n"
+            async for result in results:
+                yield result.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    return sorted(rejected + [result async for result in results], key=lambda r: r.index)
+
+
+# =====================
+# PRINT SHEET
+# =====================
+@router.post("/sheet/")
+async def create_sheet(data: SheetRequest, user=Depends(get_current_user)):
+    rows = {row.id: row for row in await QRDAO.export_rows(user_id=user.id, ids=data.qr_ids)}
+    missing = [qr_id for qr_id in data.qr_ids if qr_id not in rows]
+    if missing:
+        raise HTTPException(404, f"QR not found: {missing[:20]}")
+
+    # порядок на листе — как в запросе, повторы допустимы
+    items = [
+        (short_url(rows[qr_id].short_code), QRLogic.image_style(rows[qr_id]).model_dump(), rows[qr_id].name)
+        for qr_id in data.qr_ids
+    ]
+    try:
+        content = await render_sheet(items, data.layout)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    fmt = data.layout.format
+    return Response(
+        content,
+        media_type=IMAGE_FORMATS[fmt][0],
+        headers={"Content-Disposition": f'attachment; filename="qr-sheet.{fmt}"'},
     )
 
 
 # =====================
 # GET ALL
 # =====================
-@router.get("/", response_model=List[QROut])
-async def get_all(user=Depends(get_current_user)):
-    qrs = await QRDAO.get(user_id=user.id)
+@router.get("/", response_model=QRListOut)
+async def get_all(
+    after: int | None = Query(None, ge=0),
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    user=Depends(get_current_user),
+):
+    qrs, next_cursor = await QRDAO.get_keyset(LIST_COLUMNS, after=after, limit=limit, user_id=user.id)
 
-    return [
+    items = [
         QROut(
             id=qr.id,
             name=qr.name,
             description=qr.description,
             link=qr.link,
-            src=f"/qr/{qr.id}/image/",
+            short_code=qr.short_code,
+            src=QRLogic.image_src(qr),
+            scan_count=qr.scan_count + scan_buffer.pending_for(qr.id),
         )
         for qr in qrs
     ]
+    return QRListOut(items=items, next_cursor=next_cursor)
+
+
+# =====================
+# EXPORT ZIP
+# =====================
+@router.get("/export.zip")
+async def export_zip(
+    formats: List[Literal["png", "svg", "pdf"]] = Query(["png"], alias="format"),
+    user=Depends(get_current_user),
+):
+    rows = await QRDAO.export_rows(user_id=user.id)
+    return StreamingResponse(
+        zip_stream(rows, list(dict.fromkeys(formats))),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qr-codes.zip"'},
+    )
+
+
+# =====================
+# SCAN STATS
+# =====================
+@router.get("/stats/", response_model=ScanStatsOut)
+async def get_user_stats(
+    granularity: Literal["hour", "day"] = "day",
+    days: int = Query(90, ge=1, le=366),
+    user=Depends(get_current_user),
+):
+    return await QRLogic.scan_stats(scope="user", key=user.id, granularity=granularity, days=days)
+
+
+@router.get("/{qr_id}/stats/", response_model=ScanStatsOut)
+async def get_qr_stats(
+    qr_id: int,
+    granularity: Literal["hour", "day"] = "day",
+    days: int = Query(90, ge=1, le=366),
+    user=Depends(get_current_user),
+):
+    qr = await QRDAO.get_one_or_none(id=qr_id, user_id=user.id)
+    if not qr:
+        raise HTTPException(404, "QR not found")
+    return await QRLogic.scan_stats(scope="qr", key=qr_id, granularity=granularity, days=days)
 
 
 # =====================
@@ -103,7 +191,9 @@ async def get_one(qr_id: int, user=Depends(get_current_user)):
         name=qr.name,
         description=qr.description,
         link=qr.link,
-        src=f"/qr/{qr.id}/image/",
+        short_code=qr.short_code,
+        src=QRLogic.image_src(qr),
+        scan_count=qr.scan_count + scan_buffer.pending_for(qr.id),
     )
 
 
@@ -111,16 +201,40 @@ async def get_one(qr_id: int, user=Depends(get_current_user)):
 # GET IMAGE
 # =====================
 @router.get("/{qr_id}/image/")
-async def get_image(qr_id: int, user=Depends(get_current_user)):
+async def get_image(
+    qr_id: int,
+    request: Request,
+    format: Literal["png", "svg", "pdf"] = "png",
+    size: int | None = Query(None, ge=64, le=4096),
+    v: str | None = None,
+    user=Depends(get_current_user),
+):
     qr = await QRDAO.get_one_or_none(id=qr_id, user_id=user.id)
     if not qr:
         raise HTTPException(404, "QR not found")
 
+    # ETag — ключ рендера: 304 отдаётся без рендера и без чтения файла
+    version = QRLogic.image_version(qr, format, size)
+    etag = f'"{version}"'
+    immutable = v is not None and len(v) == IMAGE_VERSION_LENGTH and version.startswith(v)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMAGE_CACHE_IMMUTABLE if immutable else IMAGE_CACHE_REVALIDATE,
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    data = await QRLogic.image(qr, format, size)
+    if data is not None:
+        headers["Content-Disposition"] = f'inline; filename="qr-{qr.id}.{format}"'
+        return Response(data, media_type=IMAGE_FORMATS[format][0], headers=headers)
+
     file_path = Path(qr.src)
     if not file_path.exists():
         raise HTTPException(404, "QR image missing")
 
-    return FileResponse(file_path, media_type="image/png")
+    # тип — по расширению сохранённого файла (старые QR хранятся и как .jpg)
+    return FileResponse(file_path, headers=headers)
 
 
 # =====================
@@ -132,23 +246,23 @@ async def update_qr(
     data: QRUpdate,
     user=Depends(get_current_user),
 ):
-    updated = await QRDAO.update(
+    # один запрос: UPDATE ... WHERE id AND user_id RETURNING
+    qr = await QRDAO.update_returning(
         id=qr_id,
+        values=data.model_dump(exclude_unset=True),
         user_id=user.id,
-        **data.model_dump(exclude_unset=True),
     )
-
-    if not updated:
-        raise HTTPException(404, "QR not found or no changes")
-
-    qr = await QRDAO.get_one_or_none(id=qr_id, user_id=user.id)
+    if not qr:
+        raise HTTPException(404, "QR not found")
 
     return QROut(
         id=qr.id,
         name=qr.name,
         description=qr.description,
         link=qr.link,
-        src=f"/qr/{qr.id}/image/",
+        short_code=qr.short_code,
+        src=QRLogic.image_src(qr),
+        scan_count=qr.scan_count + scan_buffer.pending_for(qr.id),
     )
 
 
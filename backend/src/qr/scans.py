@@ -0,0 +1,203 @@
+"""
+Приём событий сканирования.
+
+Редирект только кладёт событие в буфер процесса; фоновая задача пишет
+буфер пачками через COPY (asyncpg) по размеру или по таймеру и в той же
+транзакции увеличивает qrs.scan_count и часовые/дневные роллупы. Незаписанные сканы учитываются в
+счётчиках в памяти, так что число сканов читается без обхода таблицы.
+"""
+import asyncio
+import logging
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from asyncpg.exceptions import ForeignKeyViolationError
+
+from src.config import settings
+from src.database import engine
+
+logger = logging.getLogger(__name__)
+
+SCAN_COLUMNS = ("qr_id", "scanned_at", "user_agent", "referrer")
+USER_AGENT_MAX_LENGTH = 512
+REFERRER_MAX_LENGTH = 1024
+# сколько раз пробуем дописать буфер при остановке, если БД недоступна
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+# Роллапы обновляются в той же транзакции, что и COPY событий: каждое
+# событие учитывается ровно один раз без водяных знаков по id, которые
+# при параллельных коммитах нескольких воркеров могут пропускать строки.
+# $1 qr_id[], $2 час[], $3 число сканов[] — уже сгруппированы по (qr, час).
+_ROLLUP_HOURLY = """
+    SELECT v.qr_id, q.user_id, v.bucket, v.n
+    FROM unnest($1::int[], $2::timestamp[], $3::bigint[]) AS v(qr_id, bucket, n)
+    JOIN qrs q ON q.id = v.qr_id
+"""
+ROLLUP_STATEMENTS = tuple(
+    f"""
+    INSERT INTO {table} ({key}, bucket, scans)
+    SELECT {key}, date_trunc('{unit}', bucket), sum(n) FROM ({_ROLLUP_HOURLY}) AS h
+    GROUP BY 1, 2 ORDER BY 1, 2  -- единый порядок блокировок между воркерами
+    ON CONFLICT ({key}, bucket) DO UPDATE SET scans = {table}.scans + EXCLUDED.scans
+    """
+    for table, key, unit in (
+        ("qrscanhours", "qr_id", "hour"),
+        ("qrscandays", "qr_id", "day"),
+        ("userscanhours", "user_id", "hour"),
+        ("userscandays", "user_id", "day"),
+    )
+)
+
+
+class ScanBuffer:
+    def __init__(self, capacity: int, flush_size: int, flush_interval: float, backpressure_timeout: float):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.backpressure_timeout = backpressure_timeout
+        self._buffer: deque[tuple] = deque()
+        # сканы, ещё не попавшие в qrs.scan_count (в буфере или в полёте)
+        self._pending: Counter[int] = Counter()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+
+    # ---------- запись ----------
+    async def record(self, qr_id: int, user_agent: str | None, referrer: str | None) -> bool:
+        """
+        Быстрый путь — без await. При переполнении буфера ждём освобождения
+        места не дольше backpressure_timeout, потом событие отбрасывается:
+        редирект не должен зависеть от доступности БД.
+        """
+        if len(self._buffer) >= self.capacity:
+            self._space.clear()
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), self.backpressure_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        self._buffer.append((
+            qr_id,
+            datetime.now(timezone.utc).replace(tzinfo=None),
+            user_agent[:USER_AGENT_MAX_LENGTH] if user_agent else None,
+            referrer[:REFERRER_MAX_LENGTH] if referrer else None,
+        ))
+        self._pending[qr_id] += 1
+        if len(self._buffer) >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def pending_for(self, qr_id: int) -> int:
+        return self._pending.get(qr_id, 0)
+
+    # ---------- сброс в БД ----------
+    async def _write(self, batch: list[tuple]) -> None:
+        counts = Counter(event[0] for event in batch)
+        hourly = Counter((event[0], event[1].replace(minute=0, second=0, microsecond=0)) for event in batch)
+        rollup_args = (
+            [qr_id for qr_id, _ in hourly],
+            [bucket for _, bucket in hourly],
+            list(hourly.values()),
+        )
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            async with driver.transaction():
+                try:
+                    async with driver.transaction():
+                        await driver.copy_records_to_table("scanevents", records=batch, columns=SCAN_COLUMNS)
+                except ForeignKeyViolationError:
+                    # QR удалили, пока скан лежал в буфере: пишем только живые
+                    alive = set(await driver.fetchval(
+                        "SELECT array_agg(id) FROM qrs WHERE id = ANY($1::int[])", list(counts)
+                    ) or [])
+                    batch = [event for event in batch if event[0] in alive]
+                    if batch:
+                        await driver.copy_records_to_table("scanevents", records=batch, columns=SCAN_COLUMNS)
+                await driver.execute(
+                    "UPDATE qrs SET scan_count = qrs.scan_count + v.n "
+                    "FROM unnest($1::int[], $2::bigint[]) AS v(id, n) WHERE qrs.id = v.id",
+                    list(counts.keys()),
+                    list(counts.values()),
+                )
+                for statement in ROLLUP_STATEMENTS:
+                    await driver.execute(statement, *rollup_args)
+        self._pending -= counts
+
+    async def flush(self) -> bool:
+        """Пишет всё накопленное пачками по flush_size; False, если БД не приняла."""
+        while self._buffer:
+            size = min(self.flush_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(size)]
+            if len(self._buffer) < self.capacity:
+                self._space.set()
+            try:
+                await self._write(batch)
+            except Exception:
+                self.failures += 1
+                logger.exception("Scan events flush failed, %d events requeued", len(batch))
+                self._requeue(batch)
+                return False
+            self.flushed += len(batch)
+        return True
+
+    def _requeue(self, batch: list[tuple]) -> None:
+        self._buffer.extendleft(reversed(batch))
+        while len(self._buffer) > self.capacity:
+            event = self._buffer.pop()
+            self._pending[event[0]] -= 1
+            self.dropped += 1
+        self._pending += Counter()  # убираем нулевые счётчики
+
+    # ---------- жизненный цикл ----------
+    async def _run(self) -> None:
+        attempts = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            ok = await self.flush()
+            if self._closing:
+                attempts += 1
+                if ok or attempts >= SHUTDOWN_FLUSH_ATTEMPTS:
+                    return
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Дожидается записи буфера при остановке (редеплой не теряет события)."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._buffer:
+            logger.error("Scan events lost on shutdown: %d", len(self._buffer))
+
+    def snapshot(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+scan_buffer = ScanBuffer(
+    capacity=settings.SCAN_BUFFER_CAPACITY,
+    flush_size=settings.SCAN_FLUSH_SIZE,
+    flush_interval=settings.SCAN_FLUSH_INTERVAL,
+    backpressure_timeout=settings.SCAN_BACKPRESSURE_TIMEOUT,
+)
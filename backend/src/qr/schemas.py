@@ -1,22 +1,71 @@
 from fastapi import Form
-from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Any, Dict, Literal, Optional
+
+HexColor = Annotated[str, Field(pattern=r"^#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")]
 
 class QROut(BaseModel):
     id: int
     name: str
     description: str | None = None
     link: str
+    short_code: str | None = None
     src: str 
+    scan_count: int = 0
 
     class Config:
         from_attributes = True
 
+class QRListOut(BaseModel):
+    items: list[QROut]
+    next_cursor: int | None = None
+
+class QRColors(BaseModel):
+    foreground: HexColor = "#000000"
+    background: HexColor = "#ffffff"
+    gradient: Optional[tuple[HexColor, HexColor]] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def normalize(cls, data: Any):
+        # фронтенд присылает как {primary, secondary, gradient: bool},
+        # так и {foreground, gradient: {enabled, start, end}}
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        if "primary" in data:
+            data.setdefault("foreground", data.pop("primary"))
+        gradient = data.get("gradient")
+        if isinstance(gradient, dict):
+            if gradient.get("enabled"):
+                if not gradient.get("start") or not gradient.get("end"):
+                    raise ValueError("Gradient requires start and end colors")
+                data["gradient"] = (gradient["start"], gradient["end"])
+            else:
+                data["gradient"] = None
+        elif gradient is True and data.get("secondary"):
+            if not data.get("foreground"):
+                raise ValueError("Gradient requires a primary color")
+            data["gradient"] = (data["foreground"], data["secondary"])
+        elif not isinstance(gradient, (list, tuple)):
+            data["gradient"] = None
+        data.pop("secondary", None)
+        return data
+
+class QRStyle(BaseModel):
+    pattern: Literal["squares", "dots", "rounded"] = "squares"
+    eye_style: Literal["square", "rounded", "dots"] = "square"
+    colors: QRColors = Field(default_factory=QRColors)
+    error_correction: Literal["L", "M", "Q", "H"] = "M"
+    size: int = Field(1024, ge=64, le=4096)
+    border: int = Field(4, ge=0, le=16)
+
 class QRCreate(BaseModel):
     name: str
     description: Optional[str] = None
     link: Optional[str] = None
-    qr_style: Dict[str, Any]
+    qr_style: QRStyle = Field(default_factory=QRStyle)
     
     @classmethod
     def as_form(
@@ -30,3 +79,32 @@ class QRCreate(BaseModel):
 class QRUpdate(BaseModel):
     description: Optional[str] = None
     link: Optional[str] = None
+
+class QRBatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    qr: Optional[QROut] = None
+    error: Optional[str] = None
+
+class ScanStatsPoint(BaseModel):
+    bucket: datetime
+    scans: int
+
+class ScanStatsOut(BaseModel):
+    granularity: Literal["hour", "day"]
+    total: int
+    points: list[ScanStatsPoint]
+
+class SheetLayout(BaseModel):
+    paper: Literal["A3", "A4", "A5", "Letter"] = "A4"
+    orientation: Literal["portrait", "landscape"] = "portrait"
+    dpi: int = Field(300, ge=72, le=600)
+    margin_mm: float = Field(10, ge=0, le=50)
+    gap_mm: float = Field(4, ge=0, le=50)
+    code_mm: float = Field(30, ge=5, le=250)
+    labels: bool = True
+    format: Literal["png", "pdf"] = "pdf"
+
+class SheetRequest(BaseModel):
+    qr_ids: list[int] = Field(min_length=1, max_length=10_000)
+    layout: SheetLayout = Field(default_factory=SheetLayout)
@@ -0,0 +1,179 @@
+"""
+Листы печати: много QR на одной странице (PNG) или на нескольких (PDF).
+
+Страница — один холст NumPy. Плитки всех кодов страницы (QR плюс полоса
+подписи) собираются в массив (k, h, w, 3) и кладутся на холст одним
+присваиванием через strided-представление сетки. Каждая страница
+собирается в отдельном процессе пула, PDF склеивается в основном.
+"""
+import asyncio
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageDraw, ImageFont
+
+from src.config import settings
+from src.qr.encoder import encode
+from src.qr.pool import get_render_pool
+from src.qr.render import PNG_COMPRESS_LEVEL, colorize, encode_png_rgb, pdf_document, rasterize
+from src.qr.schemas import QRStyle, SheetLayout
+
+PAPER_MM = {"A3": (297, 420), "A4": (210, 297), "A5": (148, 210), "Letter": (215.9, 279.4)}
+LABEL_MM = 5
+LABEL_FONT_SHARE = 0.6  # кегль от высоты полосы подписи
+LABEL_MAX_CHARS = 80
+# ограничение холста одной страницы (A4 при 600 dpi ~ 35 Мп)
+MAX_SHEET_PIXELS = 40_000_000
+WHITE = 255
+
+
+def _px(mm: float, dpi: int) -> int:
+    return round(mm / 25.4 * dpi)
+
+
+@dataclass(frozen=True)
+class SheetGrid:
+    width: int
+    height: int
+    code: int
+    label: int
+    cols: int
+    rows: int
+    pitch_x: int
+    pitch_y: int
+    x0: int
+    y0: int
+
+    @property
+    def per_page(self) -> int:
+        return self.cols * self.rows
+
+
+def sheet_grid(layout: SheetLayout) -> SheetGrid:
+    """Сетка страницы в пикселях, сетка центрируется внутри полей."""
+    width_mm, height_mm = PAPER_MM[layout.paper]
+    if layout.orientation == "landscape":
+        width_mm, height_mm = height_mm, width_mm
+    width, height = _px(width_mm, layout.dpi), _px(height_mm, layout.dpi)
+    if width * height > MAX_SHEET_PIXELS:
+        raise ValueError("Sheet is too large, lower the DPI")
+    margin, gap = _px(layout.margin_mm, layout.dpi), _px(layout.gap_mm, layout.dpi)
+    code = _px(layout.code_mm, layout.dpi)
+    label = _px(LABEL_MM, layout.dpi) if layout.labels else 0
+    cols = (width - 2 * margin + gap) // (code + gap)
+    rows = (height - 2 * margin + gap) // (code + label + gap)
+    if cols < 1 or rows < 1:
+        raise ValueError("QR code does not fit on the sheet")
+    return SheetGrid(
+        width=width,
+        height=height,
+        code=code,
+        label=label,
+        cols=cols,
+        rows=rows,
+        pitch_x=code + gap,
+        pitch_y=code + label + gap,
+        x0=(width - cols * (code + gap) + gap) // 2,
+        y0=(height - rows * (code + label + gap) + gap) // 2,
+    )
+
+
+@lru_cache(maxsize=8)
+def _font(size: int):
+    try:
+        return ImageFont.truetype(settings.QR_SHEET_FONT, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _label_mask(text: str, width: int, height: int) -> np.ndarray:
+    """Подпись по центру полосы width x height, True — чернила."""
+    font = _font(max(int(height * LABEL_FONT_SHARE), 6))
+    text = " ".join(text.split())[:LABEL_MAX_CHARS]
+    if font.getlength(text) > width:
+        # самый длинный префикс, который влезает вместе с многоточием
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if font.getlength(text[:mid] + "…") <= width:
+                lo = mid
+            else:
+                hi = mid - 1
+        text = text[:lo] + "…"
+    image = Image.new("L", (width, height), WHITE)
+    ImageDraw.Draw(image).text((width / 2, height / 2), text, fill=0, font=font, anchor="mm")
+    return np.asarray(image) < 128
+
+
+def _tile(payload: str, style: QRStyle, name: str, grid: SheetGrid) -> np.ndarray:
+    modules = encode(payload, style.error_correction)
+    if modules.shape[0] + 2 * style.border > grid.code:
+        raise ValueError("QR code is too small for its data at this DPI")
+    indexes, palette = colorize(rasterize(modules, style, grid.code), style.colors)
+    tile = np.full((grid.code + grid.label, grid.code, 3), WHITE, dtype=np.uint8)
+    tile[:grid.code] = np.asarray(palette, dtype=np.uint8)[indexes.astype(np.uint8)]
+    if grid.label:
+        tile[grid.code:][_label_mask(name, grid.code, grid.label)] = 0
+    return tile
+
+
+def compose_page(items: list[tuple[str, dict, str]], layout: dict) -> np.ndarray:
+    """items — (данные, стиль, подпись) не больше grid.per_page штук."""
+    grid = sheet_grid(SheetLayout(**layout))
+    tiles = np.stack([_tile(payload, QRStyle(**style), name, grid) for payload, style, name in items])
+    canvas = np.full((grid.height, grid.width, 3), WHITE, dtype=np.uint8)
+    # ячейки сетки как массив (rows, cols, h, w, 3) поверх памяти холста
+    origin = canvas[grid.y0:, grid.x0:]
+    s0, s1, s2 = origin.strides
+    cells = np.lib.stride_tricks.as_strided(
+        origin,
+        shape=(grid.rows, grid.cols) + tiles.shape[1:],
+        strides=(grid.pitch_y * s0, grid.pitch_x * s1, s0, s1, s2),
+        writeable=True,
+    )
+    index = np.arange(len(items))
+    cells[index // grid.cols, index % grid.cols] = tiles
+    return canvas
+
+
+def render_page(items: list[tuple[str, dict, str]], layout: dict) -> bytes:
+    """В процессе пула: PNG страницы или сжатый RGB для картинки в PDF."""
+    canvas = compose_page(items, layout)
+    if layout["format"] == "png":
+        return encode_png_rgb(canvas)
+    return zlib.compress(canvas.tobytes(), PNG_COMPRESS_LEVEL)
+
+
+def _sheet_pdf(pages: list[bytes], layout: SheetLayout, grid: SheetGrid) -> bytes:
+    width_pt, height_pt = grid.width / layout.dpi * 72, grid.height / layout.dpi * 72
+    image = (
+        f"/Type /XObject /Subtype /Image /Width {grid.width} /Height {grid.height} "
+        "/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode"
+    )
+    return pdf_document([
+        (width_pt, height_pt, f"q {width_pt:.3f} 0 0 {height_pt:.3f} 0 0 cm /Im0 Do Q", {"XObject": {"Im0": (image, data)}})
+        for data in pages
+    ])
+
+
+async def render_sheet(items: list[tuple[str, dict, str]], layout: SheetLayout) -> bytes:
+    """
+    Страницы рендерятся параллельно в пуле процессов. PNG — только один
+    лист; ValueError, если коды не помещаются.
+    """
+    grid = sheet_grid(layout)
+    pages = [items[i:i + grid.per_page] for i in range(0, len(items), grid.per_page)]
+    if layout.format == "png" and len(pages) > 1:
+        raise ValueError(f"PNG sheet holds at most {grid.per_page} codes, use PDF for more")
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    layout_dict = layout.model_dump()
+    rendered = await asyncio.gather(*(
+        loop.run_in_executor(pool, render_page, page, layout_dict) for page in pages
+    ))
+    if layout.format == "png":
+        return rendered[0]
+    return await run_in_threadpool(_sheet_pdf, rendered, layout, grid)
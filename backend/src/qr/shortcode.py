@@ -0,0 +1,106 @@
+"""
+Выдача коротких кодов QR без коллизий и без повторных попыток.
+
+Номер берётся из последовательности БД блоками по SHORT_CODE_BLOCK: один
+nextval резервирует за воркером целый диапазон, так что на каждый QR
+лишних запросов нет. Номер переводится в код обратимой перестановкой
+(сеть Фейстеля с обходом цикла) и base62 фиксированной длины: соседние
+номера дают непохожие коды, а разные номера — всегда разные коды.
+"""
+import asyncio
+import hashlib
+
+from sqlalchemy import text
+
+from src.config import settings
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+# шаг последовательности qr_short_code_seq (см. миграцию) — размер блока
+SHORT_CODE_BLOCK = 1000
+
+_HALF_BITS = 18  # 36 бит >= 62**6, лишнее отбрасывается обходом цикла
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+_KEY = hashlib.blake2b(settings.SHORT_CODE_KEY.encode("utf-8"), digest_size=32).digest()
+
+
+def _round(value: int, index: int) -> int:
+    digest = hashlib.blake2b(
+        value.to_bytes(3, "big"), key=_KEY, digest_size=3, person=index.to_bytes(16, "big")
+    ).digest()
+    return int.from_bytes(digest, "big") & _HALF_MASK
+
+
+def _feistel(value: int, rounds) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for index in rounds:
+        left, right = right, left ^ _round(right, index)
+    return right << _HALF_BITS | left
+
+
+def _permute(number: int, rounds) -> int:
+    # перестановка на 2**36; значения за пределами CODE_SPACE прогоняем ещё раз
+    value = _feistel(number, rounds)
+    while value >= CODE_SPACE:
+        value = _feistel(value, rounds)
+    return value
+
+
+def encode_short_code(number: int) -> str:
+    if not 0 <= number < CODE_SPACE:
+        raise ValueError("Short code space exhausted")
+    value = _permute(number, range(_ROUNDS))
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, rem = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+def decode_short_code(code: str) -> int:
+    value = 0
+    for char in code:
+        value = value * len(ALPHABET) + ALPHABET.index(char)
+    return _permute(value, range(_ROUNDS - 1, -1, -1))
+
+
+def short_url(short_code: str) -> str:
+    return f"{settings.SHORT_LINK_BASE}/{short_code}"
+
+
+class ShortCodeAllocator:
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._blocks: list[tuple[int, int]] = []
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, session, count: int = 1) -> list[str]:
+        """
+        count кодов; в БД ходим, только когда зарезервированные блоки
+        кончились, и тогда одним запросом берём все недостающие блоки.
+        """
+        async with self._lock:
+            available = sum(end - start for start, end in self._blocks)
+            if available < count:
+                missing = -(-(count - available) // self.block_size)
+                starts = await session.execute(
+                    text("SELECT nextval('qr_short_code_seq') FROM generate_series(1, :n)"),
+                    {"n": missing},
+                )
+                self._blocks.extend((start, start + self.block_size) for start in starts.scalars())
+
+            numbers = []
+            while len(numbers) < count:
+                start, end = self._blocks[0]
+                take = min(count - len(numbers), end - start)
+                numbers.extend(range(start, start + take))
+                if start + take == end:
+                    self._blocks.pop(0)
+                else:
+                    self._blocks[0] = (start + take, end)
+        return [encode_short_code(number) for number in numbers]
+
+
+short_code_allocator = ShortCodeAllocator(SHORT_CODE_BLOCK)
@@ -1,4 +1,4 @@
-from fastapi import Depends, Request, WebSocket, WebSocketDisconnect, status
+from fastapi import Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
 from src.exceptions import TokenNoFoundException, NoJwtException, TokenExpiredException, NoUserIdException, NoUserException
 from src.user.auth import get_auth_data
 from jose import jwt, JWTError
@@ -31,4 +31,15 @@ async def get_current_user(token: str = Depends(get_token)):
     user = await UserDAO.get_one_or_none_by_id(id = int(user_id))
     if not user:
         raise NoUserException
-    return user
\ No newline at end of file
+    return user
+
+
+async def get_optional_user(request: Request):
+    # для ресурсов, открытых и без входа: None вместо 401
+    token = request.cookies.get("access_user_token")
+    if not token:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None